@@ -0,0 +1,68 @@
+import dataclasses
+import json
+import os
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from numpy.lib.stride_tricks import sliding_window_view
+from models.model import Model, Series
+
+HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'inflation_annual.json')
+
+
+def load_history(path:str = HISTORY) -> pd.DataFrame:
+    """Yearly growth rate of every series in ``inflation_annual.json`` (``cpi`` gives inflation), indexed by year.
+    NaN where the series, or its previous year, is missing."""
+    with open(path) as stream:
+        records = json.load(stream)['records']
+    return pd.DataFrame.from_records(records, index='year').astype(float).pct_change(fill_method=None)
+
+
+@dataclass
+class BacktestResult:
+    """``values[row]`` of every window, ``(windows, periods)``, with the historical year each window starts at."""
+    start_years: np.ndarray
+    periods: list
+    values: dict[str, np.ndarray]
+
+    def final(self, row:str) -> pd.Series:
+        """Value of ``row`` in the last period, by starting year."""
+        return pd.Series(self.values[row][:, -1], index=pd.Index(self.start_years, name='start_year'), name=row)
+
+    def summary(self) -> pd.DataFrame:
+        """Worst, median and best final value of every row, and the starting years of the worst and best windows."""
+        summary = {}
+        for row in self.values:
+            final = self.final(row)
+            summary[row] = {'worst': final.min(), 'worst_start': final.idxmin(), 'median': final.median(),
+                            'best': final.max(), 'best_start': final.idxmax()}
+        return pd.DataFrame(summary).T.astype({'worst_start': int, 'best_start': int})
+
+
+def backtest(model_cls:type[Model], inputs, history:pd.DataFrame|None = None, series:dict[str, str]|None = None,
+             years:int = 30, rows:tuple[str, ...] = ('fondos_real', 'patrimonio_real'), **kwargs) -> BacktestResult:
+    """Evaluate ``model_cls`` over every run of ``years`` consecutive historical years.
+
+    Input field ``field`` follows the yearly rates of ``history`` column ``series[field]`` from the window's
+    starting year on: by default ``inflaccion`` from the CPI and ``tir_inmobiliaria`` from the median house price.
+    Windows with a missing rate are left out. The windows are a strided view of the history, and all of them
+    are evaluated as one batched model of ``years`` years (``kwargs`` go to the model, e.g. the granularity:
+    each year's rate then applies to all of its periods).
+    """
+    history = load_history() if history is None else history
+    series = series or {'inflaccion': 'cpi', 'tir_inmobiliaria': 'medianHouseNominalUsd'}
+    # (fields, windows, years) without copying the history
+    windows = sliding_window_view(history[list(series.values())].to_numpy().T, years, axis=1)
+    complete = ~np.isnan(windows).any(axis=(0, 2))
+    if not complete.any():
+        raise ValueError(f"No run of {years} years has every series in {list(series.values())}")
+    periods_per_year = model_cls(inputs, **kwargs).periods_per_year
+    stacked = dataclasses.replace(inputs, **{field: Series(np.repeat(windows[i][complete], periods_per_year, axis=1))
+                                             for i, field in enumerate(series)})
+    with model_cls(stacked, **kwargs) as model:
+        model.periods = years*periods_per_year
+        model.scenarios = int(complete.sum())
+        model.build()
+        plan = model.evaluate(list(rows))
+        values = {row: plan.values[plan.slots[row]].T.copy() for row in rows}
+        return BacktestResult(history.index.to_numpy()[:len(complete)][complete], model.period_labels(), values)
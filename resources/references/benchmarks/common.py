@@ -0,0 +1,34 @@
+"""Inputs and helpers shared by the benchmarks (the base case of ``vida_clean.py``)."""
+import os
+import sys
+from models.vida import InputsModeloVida
+
+inputs = InputsModeloVida(
+    year_indepen=2028,
+    year_compra_vivienda=2032,
+    alquiler_mensual=1900,
+    precio_vivienda=600,
+    tin_hipoteca=2.9/100,
+    years_hipoteca=30,
+    ingresos_trabajo_brutos_y0=45,
+    ingresos_trabajo_brutos_y15=100,
+    tasa_impositiva_salario=0.31,
+    nacimiento_hijos=[2030, 2031, 2033, 2035, 2037],
+    coste_educacion_mensual=700,
+    alimentacion_mensual=160,
+    ocio_mensual=50,
+    vestimenta_mensual=50,
+    otros_gastos_mensuales=200,
+    capital_inicial=750
+)
+
+
+def rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1])*os.sysconf('SC_PAGE_SIZE')/2**20
+    except OSError:
+        # No /proc (macOS): peak RSS is the best available, still flat if nothing leaks
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak/2**20 if sys.platform == 'darwin' else peak/2**10
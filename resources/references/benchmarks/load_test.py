@@ -0,0 +1,75 @@
+"""Load test for the ModeloVida HTTP service (``service.py``) running on localhost.
+
+    python benchmarks/load_test.py [--port 8765] [--requests 2000] [--concurrency 64] [--distinct 200]
+
+Each of ``--concurrency`` keep-alive connections posts the base case of ``vida_clean.py`` with
+``precio_vivienda`` drawn from ``--distinct`` values, so the run mixes cache hits, coalesced and
+fresh evaluations. Reports client-side latency percentiles and throughput, then the server's metrics.
+"""
+import argparse
+import asyncio
+import dataclasses
+import json
+import random
+import sys
+import time
+import numpy as np
+from common import inputs
+
+
+async def request(reader:asyncio.StreamReader, writer:asyncio.StreamWriter, method:str, path:str, body:bytes = b'') -> tuple[int, bytes]:
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def client(host:str, port:int, count:int, distinct:int, latencies:list, failures:list):
+    reader, writer = await asyncio.open_connection(host, port)
+    base = dataclasses.asdict(inputs)
+    for _ in range(count):
+        body = json.dumps({**base, 'precio_vivienda': 300 + random.randrange(distinct)}).encode()
+        start = time.perf_counter()
+        status, _ = await request(reader, writer, 'POST', '/evaluate', body)
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            failures.append(status)
+    writer.close()
+
+
+async def run(host:str, port:int, requests:int, concurrency:int, distinct:int) -> int:
+    latencies, failures = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*[client(host, port, requests//concurrency + (i < requests % concurrency), distinct, latencies, failures)
+                           for i in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies)*1e3
+    print(f"{len(latencies)} requests in {elapsed:.2f} s: {len(latencies)/elapsed:.0f} req/s, {len(failures)} failed")
+    print("latency ms  " + "  ".join(f"p{p} {np.percentile(latencies, p):.1f}" for p in (50, 95, 99)) + f"  max {latencies.max():.1f}")
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, metrics = await request(reader, writer, 'GET', '/metrics')
+    writer.close()
+    print("server", json.dumps(json.loads(metrics), indent=2))
+    return 1 if failures else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--distinct', type=int, default=200, help="number of different inputs sent")
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args.host, args.port, args.requests, args.concurrency, args.distinct))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,29 @@
+"""Resident memory over repeated build/evaluate/dispose cycles of ModeloVida.
+
+    python benchmarks/memory.py [cycles]
+
+RSS should stay flat: every cycle releases its rows and plan arrays through ``Model.dispose``.
+"""
+import sys
+import time
+from models.vida import ModeloVida
+from common import inputs, rss_mb
+
+
+def main(cycles:int = 100_000):
+    report = max(1, cycles//10)
+    start = time.perf_counter()
+    baseline = None
+    for cycle in range(1, cycles + 1):
+        with ModeloVida(inputs) as model:
+            model.build()
+            model.evaluate()
+        if cycle == 1:
+            baseline = rss_mb()
+        if cycle % report == 0:
+            rss = rss_mb()
+            print(f"{cycle:>8} cycles  {time.perf_counter() - start:8.1f}s  rss {rss:8.1f} MB  ({rss - baseline:+.1f} MB)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
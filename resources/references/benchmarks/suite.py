@@ -0,0 +1,244 @@
+"""Benchmark suite for the model engine and ModeloVida. Headless: nothing is plotted or displayed.
+
+    python benchmarks/suite.py [--save results.json] [--baseline baseline.json] [--threshold 0.1] [--only name ...]
+
+Every benchmark reports the median wall time of its repeats, the peak memory traced by tracemalloc
+and the number of Python function calls (cProfile), each measured in its own run so they do not
+distort each other. With ``--baseline`` the exit code is 1 if any median is slower than the
+baseline by more than ``--threshold``.
+"""
+import argparse
+import copy
+import cProfile
+import dataclasses
+import io
+import json
+import os
+import platform
+import pstats
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from models.model import Granularity
+from models.vida import ModeloVida
+from models.sweep import sweep
+from models.optimize import pareto_search
+from models.madrid import load_precios, rent_vs_buy
+from models.backtest import backtest
+from common import inputs
+
+
+def built(periods:int = 60) -> ModeloVida:
+    model = ModeloVida(copy.deepcopy(inputs))
+    model.periods = periods
+    model.build()
+    return model
+
+
+def build():
+    built()
+
+
+def get_data(periods:int):
+    def run():
+        built(periods).get_data()
+    return run
+
+
+def result(periods:int):
+    def run():
+        built(periods).result().to_pandas()
+    return run
+
+
+def cold_start():
+    # A new interpreter running the CLI for one scenario: imports included
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as stream:
+        json.dump(dataclasses.asdict(inputs), stream)
+    try:
+        subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cli.py'),
+                        stream.name, '--t', '30'], check=True, stdout=subprocess.DEVNULL)
+    finally:
+        os.remove(stream.name)
+
+
+def forks(variants:int):
+    # Variants of one evaluated base model, each only re-evaluating the rows downstream of its input
+    def run():
+        model = built()
+        model.evaluate()
+        for i in range(variants):
+            model.fork(year_jubilacion=2030 + i % 40).evaluate()
+    return run
+
+
+def evaluate(granularity:str):
+    # A yearly run against the same 60 years in months
+    def run():
+        model = ModeloVida(copy.deepcopy(inputs), granularity=granularity)
+        model.build()
+        model.evaluate()
+    return run
+
+
+def df():
+    built().df()
+
+
+def show():
+    built().show().to_html()
+
+
+def to_html():
+    with tempfile.TemporaryFile('w+') as stream:
+        built().to_html(stream)
+
+
+def check():
+    # Only the rows the rules read are evaluated
+    built().check()
+
+
+def check_batch():
+    # Rules are masks over the whole batch, the low incomes run out of funds
+    variants = [dataclasses.replace(inputs, ingresos_trabajo_brutos_y15=income) for income in np.linspace(20, 150, 1000)]
+    ModeloVida.batch(variants).check()
+
+
+def retirement_search():
+    # Same search as vida_clean.py
+    esperanza_de_vida, herencia_nominal = 2078, 2000
+    model = built()
+    t_final = esperanza_de_vida - model.initial_period
+    herencia_real = herencia_nominal*(1 + model.inflaccion_acumulada(t_final))
+    model.goal_seek('year_jubilacion', 'patrimonio_real', t_final,
+                    lambda patrimonio: (patrimonio > herencia_real) and model.check(['fondos_disponibles']).feasible,
+                    bounds=(2027, esperanza_de_vida - 1))
+
+
+def decision_search():
+    # Same search as vida_clean.py
+    t_final, herencia_nominal = 2078 - 2026, 2000
+    pareto_search(ModeloVida, inputs, {'year_compra_vivienda': (2027, 2047), 'precio_vivienda': (300, 900), 'year_jubilacion': (2030, 2077)},
+                  {'patrimonio_real': 'max', 'year_jubilacion': 'min'},
+                  condition=lambda model: model.patrimonio_real(t_final) > herencia_nominal*(1 + model.inflaccion_acumulada(t_final)),
+                  rules=['fondos_disponibles'], t=t_final, budget=1500)
+
+
+def madrid():
+    # Every location of the Madrid housing dataset, three sizes, buying and renting
+    rent_vs_buy(inputs, load_precios())
+
+
+def historical_backtest():
+    # Every 30-year window of the historical series
+    backtest(ModeloVida, inputs)
+
+
+def grid_sweep(shape:tuple[int, int, int, int]):
+    grid = {
+        'precio_vivienda': np.linspace(300, 900, shape[0]),
+        'tin_hipoteca': np.linspace(0.01, 0.05, shape[1]),
+        'year_compra_vivienda': np.arange(2027, 2027 + shape[2]),
+        'tir_ahorros': np.linspace(0.03, 0.10, shape[3]),
+    }
+    def run():
+        with tempfile.TemporaryDirectory() as directory:
+            sweep(ModeloVida, inputs, grid, directory, rows=('patrimonio_real', 'fondos_disponibles'), format='npz')
+    return run
+
+
+BENCHMARKS = {
+    'build': (build, 20),
+    'get_data_60': (get_data(60), 20),
+    'get_data_720': (get_data(720), 5),
+    'get_data_5000': (get_data(5000), 3),
+    'result_5000': (result(5000), 3),
+    'cold_start': (cold_start, 5),
+    'fork_100': (forks(100), 5),
+    'evaluate_yearly': (evaluate(Granularity.year), 20),
+    'evaluate_monthly': (evaluate(Granularity.month), 10),
+    'df': (df, 10),
+    'show': (show, 10),
+    'to_html': (to_html, 10),
+    'check': (check, 20),
+    'check_batch': (check_batch, 5),
+    'retirement_search': (retirement_search, 10),
+    'decision_search': (decision_search, 3),
+    'madrid_rent_vs_buy': (madrid, 5),
+    'backtest': (historical_backtest, 10),
+    'sweep_1k': (grid_sweep((10, 10, 5, 2)), 5),
+    'sweep_100k': (grid_sweep((50, 20, 20, 5)), 1),
+}
+
+
+def measure(function, repeats:int) -> dict:
+    function()      # warm up imports and caches
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    profiler = cProfile.Profile()
+    profiler.runcall(function)
+    calls = pstats.Stats(profiler, stream=io.StringIO()).total_calls
+
+    return {'median': statistics.median(times), 'min': min(times), 'repeats': repeats,
+            'peak_memory_mb': peak/2**20, 'calls': calls}
+
+
+def compare(results:dict, baseline:dict, threshold:float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]['median'], result['median']
+        change = after/before - 1
+        flag = "REGRESSION" if change > threshold else ""
+        print(f"{name:<20} {before*1e3:10.2f} ms -> {after*1e3:10.2f} ms  {change:+7.1%}  {flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON file of a previous run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="allowed slowdown before failing (0.10 = 10%%)")
+    parser.add_argument('--only', nargs='*', help="run only these benchmarks")
+    args = parser.parse_args(argv)
+
+    names = args.only or list(BENCHMARKS)
+    results = {}
+    for name in names:
+        function, repeats = BENCHMARKS[name]
+        results[name] = measure(function, repeats)
+        result = results[name]
+        print(f"{name:<20} {result['median']*1e3:10.2f} ms  peak {result['peak_memory_mb']:8.1f} MB  {result['calls']:>10} calls")
+
+    if args.save:
+        with open(args.save, 'w') as stream:
+            json.dump({'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+                       'results': results}, stream, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as stream:
+            baseline = json.load(stream)['results']
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import dataclasses
+import hashlib
+import inspect
+import json
+import os
+import sys
+import tempfile
+import numpy as np
+from contextlib import contextmanager
+from functools import lru_cache
+from models.model import Series
+
+try:
+    import fcntl
+except ImportError:     # Windows: writes are still atomic renames, eviction is just not serialized
+    fcntl = None
+
+
+def canonical(value):
+    """JSON-serializable form of an inputs dataclass (or any field value) that is stable across sessions."""
+    if dataclasses.is_dataclass(value):
+        return {field.name: canonical(getattr(value, field.name)) for field in dataclasses.fields(value)}
+    if isinstance(value, Series):
+        return {'series': canonical(value.values)}
+    if isinstance(value, np.ndarray):
+        return {'dtype': str(value.dtype), 'shape': list(value.shape),
+                'sha256': hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()}
+    if isinstance(value, (list, tuple)):
+        return [canonical(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): canonical(item) for key, item in value.items()}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, float):
+        # repr keeps every bit and tells 2 from 2.0
+        return {'float': repr(value)}
+    return value
+
+
+@lru_cache(maxsize=None)
+def module_version(name:str) -> str:
+    try:
+        return hashlib.sha256(inspect.getsource(sys.modules[name]).encode()).hexdigest()
+    except (KeyError, OSError, TypeError):
+        return name
+
+
+@lru_cache(maxsize=None)
+def model_version(model_cls:type) -> str:
+    """Hash of the source of the modules defining ``model_cls`` and its bases, the engine (``models.model``)
+    included, so editing ``build``, a helper function next to it or the evaluation semantics invalidates old
+    entries. A ``version`` declared on the class stands for its own module."""
+    declared = getattr(model_cls, 'version', None)
+    modules = dict.fromkeys(cls.__module__ for cls in model_cls.__mro__ if cls is not object)
+    parts = [str(declared) if declared is not None and module == model_cls.__module__ else module_version(module)
+             for module in modules]
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+
+class ResultCache:
+    """Content-addressed on-disk cache of evaluated models, shared by processes on one machine.
+
+    Entries are keyed by a hash of the inputs, ``periods``/``granularity``/``initial_period``/``scenarios``, the row
+    names and the model version, and hold every named row in one ``.npy`` array that hits load
+    memory-mapped (no copy). Writes are atomic renames and eviction (least recently used first,
+    once the directory exceeds ``max_bytes``) runs under a file lock.
+    """
+    def __init__(self, directory:str, max_bytes:int = 1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, model, names:list[str]) -> str|None:
+        """Hash of everything that determines ``model``'s values, ``None`` if it cannot be cached
+        (overridden rows such as ``StochasticRow`` are not part of the inputs)."""
+        if model.overrides:
+            return None
+        payload = {
+            'model': f"{type(model).__module__}.{type(model).__qualname__}",
+            'version': model_version(type(model)),
+            # Models defined by data (SpecModel) carry their definition on the instance
+            'spec': canonical(getattr(model, 'spec', None)),
+            'inputs': canonical(model.inputs),
+            'periods': model.periods,
+            'granularity': model.granularity,
+            'initial_period': model.initial_period,
+            'scenarios': model.scenarios,
+            'rows': names,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=repr).encode()).hexdigest()
+
+    def path(self, key:str) -> str:
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def load(self, model, names:list[str]) -> np.ndarray|None:
+        """Values of ``names`` as a read-only memory-mapped array, or ``None`` on a miss."""
+        key = self.key(model, names)
+        if key is None:
+            return None
+        path = self.path(key)
+        try:
+            values = np.load(path, mmap_mode='r')
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return values
+
+    def store(self, model, names:list[str], values:np.ndarray):
+        """Write the entry of ``model`` unless it is already there, then evict if the directory is too large."""
+        key = self.key(model, names)
+        if key is None or os.path.exists(self.path(key)):
+            return
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as stream:
+                np.save(stream, np.ascontiguousarray(values))
+            os.replace(temporary, self.path(key))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self.stores += 1
+        self.evict()
+
+    @contextmanager
+    def lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, '.lock'), 'w') as stream:
+            fcntl.flock(stream, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(stream, fcntl.LOCK_UN)
+
+    def entries(self) -> list[tuple[float, int, str]]:
+        """``(last use, size, path)`` of every entry, oldest first."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npy'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        with self.lock():
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    # Processes that already mapped the file keep reading it, only the name goes away
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock():
+            for _, _, path in self.entries():
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'stores': self.stores, 'evictions': self.evictions}
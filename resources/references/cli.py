@@ -0,0 +1,154 @@
+"""Evaluate ModeloVida from the command line for one or many input records.
+
+    python cli.py inputs.jsonl [--rows fondos_real patrimonio_real] [--t 30] [--format jsonl|csv|table] [--output results.jsonl] [--plot results.html]
+
+Records are ``InputsModeloVida`` fields as JSON (one object or a list), JSONL or CSV (list fields such as
+``nacimiento_hijos`` written as JSON, booleans as true/false in any case, empty cells take the default); ``-``
+reads JSON or JSONL from stdin. Every value is checked against its field's type, and fields the model does not
+have are ignored with a warning. Records are evaluated as batched models of
+``--chunk-size`` and each chunk is written as soon as it is done: JSONL gives one object per record
+(``{"record": 0, "fondos_real": [...], ...}``), CSV one line per record and row with a column per period.
+Only the ``table`` format imports pandas and only ``--plot`` imports plotly, so a plain run starts in
+the time it takes to import NumPy and the model.
+"""
+import argparse
+import csv
+import itertools
+import json
+import sys
+from typing import Iterable, Iterator
+import numpy as np
+from models.model import parse_inputs, stack_inputs
+from models.vida import InputsModeloVida, ModeloVida
+
+def read_records(path:str, format:str|None = None) -> Iterator[dict]:
+    """Records of a JSON, JSONL or CSV file (by extension unless ``format`` is given), ``-`` for stdin."""
+    format = format or ('csv' if path.endswith('.csv') else 'json')
+    stream = sys.stdin if path == '-' else open(path, newline='' if format == 'csv' else None)
+    with stream:
+        if format == 'csv':
+            for record in csv.DictReader(stream):
+                # Text cells, typed by parse_inputs
+                yield {field: cell for field, cell in record.items() if cell != ''}
+            return
+        text = stream.read()
+        try:
+            records = json.loads(text)
+        except ValueError:
+            # JSONL
+            records = [json.loads(line) for line in text.splitlines() if line.strip()]
+        yield from [records] if isinstance(records, dict) else records
+
+
+def to_inputs(records:Iterable[dict]) -> Iterator[InputsModeloVida]:
+    """Inputs of every record, each field coerced to its type (``parse_inputs``). A value that is not of its
+    field's type stops the run with the number of the record."""
+    warned = set()
+    for number, record in enumerate(records):
+        try:
+            inputs, ignored = parse_inputs(InputsModeloVida, record)
+        except ValueError as error:
+            raise ValueError(f"Record {number}: {error}") from None
+        if not warned.issuperset(ignored):
+            warned.update(ignored)
+            print(f"Ignoring unknown fields: {sorted(warned)}", file=sys.stderr)
+        yield inputs
+
+
+def evaluate(inputs:list[InputsModeloVida], rows:list[str], t:int|None = None, **kwargs) -> tuple[list, np.ndarray]:
+    """Period labels and values of ``rows``, ``(records, rows, periods)``, evaluating ``inputs`` as one batched
+    model. With a period ``t`` only that period is evaluated and returned."""
+    stacked, scenarios = stack_inputs(inputs)
+    with ModeloVida(stacked, **kwargs) as model:
+        model.scenarios = scenarios
+        model.build()
+        missing = [row for row in rows if row not in model.get_rows()]
+        if missing:
+            raise ValueError(f"Unknown rows: {missing}")
+        plan = model.evaluate(rows, t)
+        slots = [plan.slots[row] for row in rows]
+        if t is None:
+            return model.period_labels(), np.moveaxis(plan.values[slots], 2, 0)
+        return [model.period_label(t)], np.moveaxis(plan.values[slots, t:t + 1], 2, 0)
+
+
+class Writer:
+    """Writes the evaluated chunks to ``stream`` as ``jsonl``, ``csv`` or a pandas ``table``."""
+    def __init__(self, stream, format:str, rows:list[str], scalar:bool):
+        self.stream = stream
+        self.format = format
+        self.rows = rows
+        self.scalar = scalar
+        self.csv = csv.writer(stream) if format == 'csv' else None
+        self.written = 0
+
+    def write(self, periods:list, values:np.ndarray):
+        records = range(self.written, self.written + len(values))
+        if self.format == 'jsonl':
+            for record, record_values in zip(records, values):
+                line = {'record': record, **{row: row_values[0].item() if self.scalar else row_values.tolist()
+                                             for row, row_values in zip(self.rows, record_values)}}
+                self.stream.write(json.dumps(line) + '\n')
+        elif self.format == 'csv':
+            if not self.written:
+                self.csv.writerow(['record', 'row', *periods])
+            for record, record_values in zip(records, values):
+                self.csv.writerows([record, row, *row_values.tolist()] for row, row_values in zip(self.rows, record_values))
+        else:
+            import pandas as pd
+            index = pd.MultiIndex.from_product([records, self.rows], names=['record', 'row'])
+            frame = pd.DataFrame(values.reshape(-1, len(periods)), index=index, columns=periods)
+            self.stream.write(frame.to_string(header=not self.written) + '\n')
+        self.written += len(values)
+        self.stream.flush()
+
+
+def plot(path:str, periods:list, values:list[np.ndarray], rows:list[str]):
+    """Every row of every record over the periods, as an HTML plotly figure."""
+    import plotly.graph_objects as go
+    fig = go.Figure()
+    for record, record_values in enumerate(itertools.chain.from_iterable(values)):
+        for row, row_values in zip(rows, record_values):
+            fig.add_trace(go.Scatter(x=periods, y=row_values, name=f'{row} ({record})'))
+    fig.write_html(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', help="JSON, JSONL or CSV file with InputsModeloVida records, - for stdin")
+    parser.add_argument('--input-format', choices=['json', 'csv'], help="json also reads JSONL (default: by extension)")
+    parser.add_argument('--rows', nargs='+', default=['fondos_real', 'patrimonio_real'])
+    parser.add_argument('--t', type=int, help="only this period (index from the first period)")
+    parser.add_argument('--granularity', choices=['year', 'month'], default='year')
+    parser.add_argument('--format', choices=['jsonl', 'csv', 'table'], default='jsonl')
+    parser.add_argument('--output', default='-', help="file to write, - for stdout")
+    parser.add_argument('--plot', help="also write an HTML figure of the rows")
+    parser.add_argument('--chunk-size', type=int, default=1_000)
+    args = parser.parse_args(argv)
+    if args.plot and args.t is not None:
+        parser.error("--plot needs every period, not --t")
+    if args.t is not None:
+        # The number of periods does not depend on the inputs
+        periods = ModeloVida(None, granularity=args.granularity).periods
+        if not 0 <= args.t < periods:
+            parser.error(f"--t must be a period index from 0 to {periods - 1} at {args.granularity} granularity")
+
+    inputs = to_inputs(read_records(args.inputs, args.input_format))
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    writer = Writer(output, args.format, args.rows, args.t is not None)
+    plotted = []
+    try:
+        while chunk := list(itertools.islice(inputs, args.chunk_size)):
+            periods, values = evaluate(chunk, args.rows, args.t, granularity=args.granularity)
+            writer.write(periods, values)
+            if args.plot:
+                plotted.append(values)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    if plotted:
+        plot(args.plot, periods, plotted, args.rows)
+
+
+if __name__ == '__main__':
+    main()
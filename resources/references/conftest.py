@@ -0,0 +1,9 @@
+import os
+import sys
+import types
+
+# The modules import each other as ``models.*``, the package this directory is used as
+if 'models' not in sys.modules:
+    models = types.ModuleType('models')
+    models.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+    sys.modules['models'] = models
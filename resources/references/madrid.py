@@ -0,0 +1,104 @@
+"""Rent versus buy with ModeloVida for every municipality, district and neighbourhood in the Madrid housing dataset.
+
+    python madrid.py inputs.json [--sizes 60 90 120] [--output madrid_compra_alquiler.csv] [--geojson madrid_compra_alquiler.geojson]
+
+Prices per m2 (``data/spain/housing/madrid/madrid_municipios_precios_merged.csv``) give ``precio_vivienda`` and
+``alquiler_mensual`` for each dwelling size. Every location and size is evaluated twice, buying in
+``year_compra_vivienda`` and renting for good, all in one batched model. The result has one line per location,
+keyed by ``uri`` like ``madrid_municipios.geojson`` (and ``pages/ViviendaMadrid.tsx``). The other inputs are an
+``InputsModeloVida`` as JSON, like the service's ``POST /evaluate`` body.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import numpy as np
+import pandas as pd
+from models.vida import InputsModeloVida, ModeloVida
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'spain', 'housing', 'madrid')
+PRECIOS = os.path.join(DATA, 'madrid_municipios_precios_merged.csv')
+GEOJSON = os.path.join(DATA, 'madrid_municipios.geojson')
+# No purchase within the model's horizon
+SIN_COMPRA = 3000
+
+
+def load_precios(path:str = PRECIOS) -> pd.DataFrame:
+    """Sale and rent prices per m2 by ``uri``. A missing price is estimated from the other one with the median
+    gross rental yield of the locations that have both (``precios_estimados``); locations with neither are dropped."""
+    precios = pd.read_csv(path).set_index('uri')
+    venta, alquiler = precios['precio_venta_eur_m2'], precios['precio_alquiler_eur_m2_mes']
+    rentabilidad = (12*alquiler/venta).median()
+    precios['precios_estimados'] = venta.isna() != alquiler.isna()
+    precios['precio_venta_eur_m2'] = venta.fillna(12*alquiler/rentabilidad)
+    precios['precio_alquiler_eur_m2_mes'] = alquiler.fillna(venta*rentabilidad/12)
+    return precios.dropna(subset=['precio_venta_eur_m2', 'precio_alquiler_eur_m2_mes'])
+
+
+def break_even(compra:np.ndarray, alquiler:np.ndarray) -> np.ndarray:
+    """First period from which buying stays ahead of renting, per scenario of ``(scenarios, periods)`` arrays; -1 if never."""
+    ahead = np.logical_and.accumulate((compra >= alquiler)[:, ::-1], axis=1)[:, ::-1]
+    return np.where(ahead[:, -1], ahead.argmax(axis=1), -1)
+
+
+def rent_vs_buy(inputs:InputsModeloVida, precios:pd.DataFrame, sizes:tuple[int, ...] = (60, 90, 120), t:int|None = None) -> pd.DataFrame:
+    """Final ``patrimonio_real`` buying minus renting (``diferencia_{size}m2``, k€ at period ``t``, the last by default)
+    and the year buying overtakes renting for good (``year_equilibrio_{size}m2``, missing if it never does) for every
+    location in ``precios`` and dwelling size in m2. Other inputs come from ``inputs``."""
+    venta = np.repeat(precios['precio_venta_eur_m2'].to_numpy(), len(sizes))
+    alquiler = np.repeat(precios['precio_alquiler_eur_m2_mes'].to_numpy(), len(sizes))
+    superficie = np.tile(np.asarray(sizes, dtype=float), len(precios))
+    points = len(venta)
+    # Buying first, then renting, over the same points
+    scenarios = dataclasses.replace(inputs,
+                                    precio_vivienda=np.tile(venta*superficie/1000, 2),
+                                    alquiler_mensual=np.tile(alquiler*superficie, 2),
+                                    year_compra_vivienda=np.repeat([inputs.year_compra_vivienda, SIN_COMPRA], points))
+    with ModeloVida(scenarios) as model:
+        model.scenarios = 2*points
+        model.build()
+        plan = model.evaluate(['patrimonio_real'])
+        patrimonio = plan.values[plan.slots['patrimonio_real']].T
+        t = model.periods - 1 if t is None else t
+        equilibrio = break_even(patrimonio[:points], patrimonio[points:])
+        years = np.where(equilibrio >= 0, model.period(equilibrio), np.nan)
+    diferencia = patrimonio[:points, t] - patrimonio[points:, t]
+
+    result = precios[['id', 'municipio', 'nivel', 'precio_venta_eur_m2', 'precio_alquiler_eur_m2_mes', 'precios_estimados']].copy()
+    for i, size in enumerate(sizes):
+        result[f'diferencia_{size}m2'] = diferencia[i::len(sizes)]
+        result[f'year_equilibrio_{size}m2'] = pd.array(years[i::len(sizes)], dtype='Int64')
+    return result
+
+
+def geojson(result:pd.DataFrame, path:str = GEOJSON) -> dict:
+    """``madrid_municipios.geojson`` with the columns of ``result`` added to the properties of each feature, by ``uri``."""
+    with open(path) as stream:
+        features = json.load(stream)
+    records = json.loads(result.drop(columns=['id', 'municipio']).to_json(orient='index'))
+    for feature in features['features']:
+        feature['properties'].update(records.get(feature['properties'].get('uri'), {}))
+    return features
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', help="JSON file with the InputsModeloVida fields")
+    parser.add_argument('--precios', default=PRECIOS)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[60, 90, 120], help="dwelling sizes in m2")
+    parser.add_argument('--output', default='madrid_compra_alquiler.csv')
+    parser.add_argument('--geojson', help="also write the municipalities geojson with the results")
+    args = parser.parse_args(argv)
+
+    with open(args.inputs) as stream:
+        inputs = InputsModeloVida(**json.load(stream))
+    result = rent_vs_buy(inputs, load_precios(args.precios), tuple(args.sizes))
+    result.to_csv(args.output)
+    if args.geojson:
+        with open(args.geojson, 'w') as stream:
+            json.dump(geojson(result), stream, ensure_ascii=False)
+    print(f"{len(result)} locations written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,21 @@
 import numpy as np
-import pandas as pd
 
-from typing import Callable, Union
-from functools import lru_cache
-from pydantic import BaseModel, PrivateAttr
+from typing import Callable, Union, TYPE_CHECKING, get_args, get_origin, get_type_hints
 from dataclasses import dataclass
+import dataclasses
 import inspect
+import heapq
+import json
+import operator
+import weakref
+import html
+import io
 from typing import Any
 
+if TYPE_CHECKING:
+    # pandas is only imported by the methods returning DataFrames, so evaluating a model does not pay for it
+    import pandas as pd
+
 def table_format(x:float):
     if abs(x)< 0.1:
         return "-"
@@ -38,6 +46,129 @@ def label_format(label:str):
     label_split[0] = label_split[0].capitalize()
     return ' '.join(label_split)
 
+def where(condition, if_true, if_false):
+    """``if_true if condition else if_false`` that also works element-wise when rows hold scenario arrays."""
+    if isinstance(condition, np.ndarray):
+        return np.where(condition, if_true, if_false)
+    return if_true if condition else if_false
+
+def maximum(a, b):
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.maximum(a, b)
+    return max(a, b)
+
+def minimum(a, b):
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.minimum(a, b)
+    return min(a, b)
+
+class Series:
+    """Value per period of an input field (read through ``InputRow``) or of a ``SimpleRow``: ``values[t]``, the
+    last value carrying on past the end. Batched inputs hold one series per scenario, ``(scenarios, periods)``."""
+    __slots__ = ('values',)
+
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=float)
+
+    def __len__(self):
+        return self.values.shape[-1]
+
+    def __repr__(self):
+        return f"Series({self.values.tolist()})"
+
+    def at(self, t):
+        values = self.values
+        index = np.minimum(t, values.shape[-1] - 1)
+        if values.ndim == 1:
+            return values[index]
+        if np.ndim(index) == 0:
+            return values[:, index]
+        # Period arrays (see EvaluationPlan._vector_row) put periods first and scenarios second
+        return values.T[index.reshape(-1)].reshape(index.shape[:1] + values.shape[:1] + index.shape[2:])
+
+    @classmethod
+    def stack(cls, series:list["Series"]) -> "Series":
+        """One series per scenario, the shorter ones padded with their last value."""
+        length = max(len(item) for item in series)
+        return cls([np.pad(item.values, (0, length - len(item)), mode='edge') for item in series])
+
+def stack_inputs(inputs, inputs_type:type|None = None) -> tuple[Any, int]:
+    """Stack N input dataclasses (or a DataFrame with one column per field) into a single instance
+    whose fields are arrays over scenarios. List fields (e.g. ``nacimiento_hijos``) become 2D arrays
+    padded with NaN, so comparisons against the padding are always False, and ``Series`` fields a
+    batched ``Series``.
+
+    Returns the stacked inputs and the number of scenarios.
+    """
+    if hasattr(inputs, 'to_dict'):  # a DataFrame, recognised without importing pandas
+        if inputs_type is None:
+            raise ValueError("Stacking a DataFrame of inputs needs the inputs dataclass type")
+        inputs = [inputs_type(**record) for record in inputs.to_dict('records')]
+    inputs = list(inputs)
+    if not inputs:
+        raise ValueError("At least one input set is needed")
+    stacked = {}
+    for field in dataclasses.fields(inputs[0]):
+        values = [getattr(item, field.name) for item in inputs]
+        if any(isinstance(value, Series) for value in values):
+            array = Series.stack([value if isinstance(value, Series) else Series([value]) for value in values])
+        elif isinstance(values[0], (list, tuple, np.ndarray)):
+            array = np.full((len(values), max(len(value) for value in values)), np.nan)
+            for i, value in enumerate(values):
+                array[i, :len(value)] = value
+        else:
+            array = np.asarray(values)
+        stacked[field.name] = array
+    return type(inputs[0])(**stacked), len(inputs)
+
+def coerce_value(value, annotation, field:str = "value"):
+    """``value`` as a field annotated ``annotation``: ``bool`` (also ``"true"``/``"false"`` in any case, 0 or 1),
+    ``int``/``float`` (numbers or numeric text; whole numbers in ``int`` fields become ``int``, others stay
+    ``float``; NaN and infinities are refused) or ``list[...]`` (a list, or its JSON text). Other annotations are left as they are.
+    Raises ValueError naming ``field`` for values that are not of the type."""
+    origin = get_origin(annotation)
+    if origin in (list, tuple):
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise ValueError(f"{field}: expected a list, got {value!r}") from None
+        if not isinstance(value, (list, tuple)):
+            raise ValueError(f"{field}: expected a list, got {value!r}")
+        item = (get_args(annotation) or (Any,))[0]
+        return [coerce_value(element, item, field) for element in value]
+    if annotation is bool:
+        if isinstance(value, str) and value.strip().lower() in ('true', 'false'):
+            return value.strip().lower() == 'true'
+        if isinstance(value, (bool, np.bool_)) or (isinstance(value, (int, float, np.number)) and value in (0, 1)):
+            return bool(value)
+        raise ValueError(f"{field}: expected true or false, got {value!r}")
+    if annotation in (int, float):
+        if isinstance(value, str):
+            try:
+                value = float(value)
+            except ValueError:
+                raise ValueError(f"{field}: expected a number, got {value!r}") from None
+        if isinstance(value, (bool, np.bool_)) or not isinstance(value, (int, float, np.number)) or not np.isfinite(value):
+            raise ValueError(f"{field}: expected a number, got {value!r}")
+        if annotation is int and float(value).is_integer():
+            return int(value)
+        return float(value)
+    return value
+
+def parse_inputs(inputs_type:type, record:dict) -> tuple[Any, list[str]]:
+    """Inputs dataclass from a JSON/CSV record, every field coerced to its annotated type (``coerce_value``),
+    and the record's fields the dataclass does not have, which are left out. Missing optional fields take
+    the dataclass defaults. Raises ValueError for values of the wrong type or missing required fields."""
+    hints = get_type_hints(inputs_type)
+    fields = {field.name: field for field in dataclasses.fields(inputs_type)}
+    missing = [name for name, field in fields.items() if name not in record
+               and field.default is dataclasses.MISSING and field.default_factory is dataclasses.MISSING]
+    if missing:
+        raise ValueError(f"Missing inputs: {missing}")
+    values = {name: coerce_value(value, hints.get(name), name) for name, value in record.items() if name in fields}
+    return inputs_type(**values), sorted(set(record) - set(fields))
+
 class Styles:
     default = "background-color: #ffffff; color: #000000;"
     default_alternate = "background-color: #ededed; color: #000000;"
@@ -56,66 +187,128 @@ class Formats:
     default = 'default'
     percentage = 'percentage'
     boolean = 'boolean'
+
+
+class Granularity:
+    year = 'year'
+    month = 'month'
+    periods_per_year = {year: 1, month: 12}
     
 
 class FormulaRow:
-    count = 0
+    # Values live in the model's EvaluationPlan arrays, rows only keep their definition
+    __slots__ = ('group', 'highlight', 'format', 'initial', 'formula', '_cache', '_plan', '_slot')
+
     def __init__(self, formula: Callable[["FormulaRow", int], float], initial: float|None = None, group:str = None, highlight:bool = False, format:str = Formats.default):
         self.group = group
         self.highlight = highlight
         self.format = format
-        self.id = self.count
-        FormulaRow.count += 1
         self.initial = initial
-        # Wrap the lambda in lru_cache right at creation
-        self.formula = lru_cache(maxsize=None)(formula)
+        self.formula = formula
+        # Memo of the lazy path, only allocated when the row is evaluated without a plan
+        self._cache: dict[int, float]|None = None
+        # Set while the row is attached to a compiled EvaluationPlan
+        self._plan: EvaluationPlan|None = None
+        self._slot: int|None = None
 
     def __call__(self, t: int) -> float:
+        plan = self._plan
+        if plan is not None:
+            try:
+                # Inputs changed since the last run (plan.dirty): lookup runs the plan first
+                if 0 <= t < plan.filled[self._slot] and not plan.dirty:
+                    return plan.values[self._slot, t]
+            except ValueError:
+                # ``t`` is an array of periods (see EvaluationPlan._vector_row)
+                return plan.read(self, t)
+            return plan.lookup(self, t)
+        return self.lazy(t)
+
+    def lazy(self, t: int) -> float:
         if (self.initial is not None) and (t == 0):
             return self.initial
-        # The lambda handles the recursion, lru_cache handles the performance
-        return self.formula(self, t)
+        # The lambda handles the recursion, the per-row memo handles the performance
+        cache = self._cache
+        if cache is None:
+            cache = self._cache = {}
+        elif t in cache:
+            return cache[t]
+        value = cache[t] = self.formula(self, t)
+        return value
     
     def clear(self):
-        # Built-in way to wipe an lru_cache
-        self.formula.cache_clear()
+        self._cache = None
 
     # --- Math Operations ---
+    def _expression(self, operation:str, left, right):
+        left_value, right_value = constant_value(left), constant_value(right)
+        if left_value is not None and right_value is not None:
+            # Constant folding: arithmetic between SimpleRows/numbers is another SimpleRow
+            return SimpleRow(ExpressionRow.operations[operation](left_value, right_value), group=self.group)
+        return ExpressionRow(operation, left, right, group=self.group)
+
     def __add__(self, other: Union["FormulaRow", int, float]):
-        return FormulaRow(lambda row, t: self(t) + (other(t) if isinstance(other, FormulaRow) else other), group=self.group)
+        return self._expression('add', self, other)
     
     def __sub__(self, other: Union["FormulaRow", int, float]):
-        return FormulaRow(lambda row, t: self(t) - (other(t) if isinstance(other, FormulaRow) else other), group=self.group)
+        return self._expression('sub', self, other)
 
     def __mul__(self, other: Union["FormulaRow", int, float]):
-        return FormulaRow(lambda row, t: self(t) * (other(t) if isinstance(other, FormulaRow) else other), group=self.group)
+        return self._expression('mul', self, other)
 
     def __truediv__(self, other: Union["FormulaRow", int, float]):
-        return FormulaRow(lambda row, t: self(t) / (other(t) if isinstance(other, FormulaRow) else other), group=self.group)
+        return self._expression('truediv', self, other)
     
     def __radd__(self, other): return self.__add__(other)
     def __rmul__(self, other): return self.__mul__(other)
 
     def __rsub__(self, other):
-        return FormulaRow(lambda row, t: - self(t) + (other(t) if isinstance(other, FormulaRow) else other), group=self.group)
+        return self._expression('sub', other, self)
 
 class SimpleRow(FormulaRow):
+    """Constant row, or one value per period if ``value`` is a ``Series``."""
+    __slots__ = ()
+
     def __init__(self, value, group:str = None, highlight:str = None, format:str = Formats.default):
-        self.group = group
-        self.highlight = highlight
-        self.format = format
-        self.id = self.count
-        FormulaRow.count += 1
-        self.initial = value
-        formula: Callable[["FormulaRow", int], float] = lambda self, t : value
-        # Wrap the lambda in lru_cache right at creation
-        self.formula = lru_cache(maxsize=None)(formula)
+        if isinstance(value, Series):
+            super().__init__(lambda self, t: value.at(t), group=group, highlight=highlight, format=format)
+        else:
+            super().__init__(lambda self, t : value, value, group=group, highlight=highlight, format=format)
+
+class ExpressionRow(FormulaRow):
+    """Arithmetic between rows (``a + b``, ``a*(1 + b)``...). Keeps the operation and its operands
+    instead of an opaque lambda, so a compiled plan can share identical subexpressions across the
+    model and evaluate the expression over whole period arrays at once."""
+    __slots__ = ('operation', 'operands')
+    operations = {'add': operator.add, 'sub': operator.sub, 'mul': operator.mul, 'truediv': operator.truediv}
+    commutative = {'add', 'mul'}
+
+    def __init__(self, operation:str, left, right, group:str = None):
+        # The formula is shared by every expression row, operands are plain attributes instead of closure cells
+        super().__init__(ExpressionRow.evaluate, group=group)
+        self.operation = operation
+        self.operands = (left, right)
+
+    @staticmethod
+    def evaluate(row:"ExpressionRow", t:int):
+        left, right = row.operands
+        return ExpressionRow.operations[row.operation](left(t) if isinstance(left, FormulaRow) else left,
+                                                       right(t) if isinstance(right, FormulaRow) else right)
+
+def constant_value(operand):
+    """Value of a constant operand (number, scenario array or ``SimpleRow``), None for any other row
+    (``SimpleRow`` series included)."""
+    if isinstance(operand, SimpleRow):
+        return operand.initial
+    if isinstance(operand, FormulaRow):
+        return None
+    return operand
 
 class RowData:
-    def __init__(self, name:str, row:FormulaRow):
+    def __init__(self, name:str, row:FormulaRow, index:int|None = None):
         self.name = name
         self.row = row
-        self.id = row.id
+        self.id = index
         self.values:dict[int, float] = {}
 
     def calculate_values(self, periods:int):
@@ -126,9 +319,967 @@ class RowData:
 
         return self.values
 
+def input_value(inputs, field:str, t):
+    value = getattr(inputs, field)
+    return value.at(t) if isinstance(value, Series) else value
+
+class InputRow(FormulaRow):
+    """Row that reads ``field`` from the model inputs at evaluation time, so ``Model.set_input`` can change it without a rebuild.
+    The field can be a ``Series`` of values per period."""
+    __slots__ = ('field',)
+
+    def __init__(self, inputs, field:str, group:str = None, highlight:bool = False, format:str = Formats.default):
+        super().__init__(lambda row, t: input_value(inputs, field, t), group=group, highlight=highlight, format=format)
+        self.field = field
+
+class RecurrenceRow(FormulaRow):
+    """Row following a standard recurrence over periods. ``step`` is the per-period definition (lazy path,
+    and inside a recurrence with other rows), ``scan`` computes a whole period range at once, which a
+    compiled plan uses instead of stepping. Operands are rows or constants read in the same period,
+    like ``ExpressionRow`` operands."""
+    __slots__ = ('operands',)
+
+    def __init__(self, *operands, group:str = None, highlight:bool = False, format:str = Formats.default):
+        super().__init__(type(self).step, group=group, highlight=highlight, format=format)
+        self.operands = operands
+
+    def lazy(self, t:int):
+        # Fill the missing earlier periods in order first, so each step only looks one period back
+        # instead of recursing to t=0 through every row of the recurrence
+        cache = self._cache
+        start = t
+        while start > 0 and cache is not None and start - 1 not in cache:
+            start -= 1
+        for k in range(0 if cache is None else start, t):
+            super().lazy(k)
+        return super().lazy(t)
+
+    def operand_values(self, t:int) -> list:
+        return [operand(t) if isinstance(operand, FormulaRow) else operand for operand in self.operands]
+
+    @staticmethod
+    def step(row:"RecurrenceRow", t:int):
+        raise NotImplementedError
+
+    def scan(self, t:np.ndarray, previous, *operands) -> np.ndarray:
+        """Values over periods ``t`` (first axis of every array) from the operands' values over them and
+        ``previous``, the row's value in the period before ``t[0]`` (None if ``t`` starts at 0)."""
+        raise NotImplementedError
+
+class CumulativeGrowthRow(RecurrenceRow):
+    """Accumulated growth of a per-period ``rate``: ``(1 + rate(t))*(1 + row(t-1)) - 1``, starting at ``rate(0)``.
+    Periods where ``active`` is 0 keep the previous value."""
+    __slots__ = ()
+
+    def __init__(self, rate, active=1, **kwargs):
+        super().__init__(rate, active, **kwargs)
+
+    @staticmethod
+    def step(row:"CumulativeGrowthRow", t:int):
+        rate, active = row.operand_values(t)
+        if t == 0:
+            return where(active, rate, 0)
+        previous = row(t - 1)
+        return where(active, (1 + rate)*(1 + previous) - 1, previous)
+
+    def scan(self, t, previous, rate, active):
+        growth = np.cumprod(np.where(active, 1 + rate, 1), axis=0)
+        return growth - 1 if previous is None else (1 + previous)*growth - 1
+
+class LinearRecurrenceRow(RecurrenceRow):
+    """Balance growing at ``rate`` per period plus ``flows``: ``row(t-1)*(1 + rate(t)) + flows(t)``, from ``opening`` before period 0."""
+    __slots__ = ()
+
+    def __init__(self, rate, flows, opening=0, **kwargs):
+        super().__init__(rate, flows, opening, **kwargs)
+
+    @staticmethod
+    def step(row:"LinearRecurrenceRow", t:int):
+        rate, flows, opening = row.operand_values(t)
+        previous = row(t - 1) if t > 0 else opening
+        return previous*(1 + rate) + flows
+
+    def scan(self, t, previous, rate, flows, opening):
+        previous = opening[0] if previous is None else previous
+        growth = np.cumprod(1 + rate, axis=0)
+        if np.all(growth != 0) and np.all(np.isfinite(growth)):
+            # x(t) = G(t)*(x(-1) + sum of flows(k)/G(k) up to t), G the accumulated growth
+            return growth*(previous + np.cumsum(flows/growth, axis=0))
+        # A -100% rate zeroes the growth: scan one period at a time (still across scenarios)
+        values = np.empty(flows.shape)
+        for k in range(len(values)):
+            previous = values[k] = previous*(1 + rate[k]) + flows[k]
+        return values
+
+class AmortizationRow(RecurrenceRow):
+    """Outstanding balance, at the start of each period, of a fixed-rate loan of ``principal`` drawn at period
+    index ``start`` and repaid in ``payments`` equal installments at ``rate`` per period. Closed form of
+    ``balance(t+1) = balance(t)*(1 + rate) - installment``: zero before ``start`` and once repaid."""
+    __slots__ = ()
+
+    def __init__(self, principal, rate, payments, start, **kwargs):
+        super().__init__(principal, rate, payments, start, **kwargs)
+
+    @staticmethod
+    def balance(t, principal, rate, payments, start):
+        k = t - start
+        factor = np.add(1.0, rate)
+        # At least one installment in the formulas, a loan without any is zero below anyway
+        terms = maximum(payments, 1)
+        growth = factor**terms
+        # Share of the principal still owed after k installments (linear without interest)
+        owed = where(rate == 0, 1 - k/terms, (growth - factor**k)/where(rate == 0, 1, growth - 1))
+        return where((k >= 0) & (k < payments), principal*owed, 0)
+
+    @staticmethod
+    def step(row:"AmortizationRow", t:int):
+        return AmortizationRow.balance(t, *row.operand_values(t))
+
+    def scan(self, t, previous, principal, rate, payments, start):
+        return AmortizationRow.balance(t, principal, rate, payments, start)
+
+
+def formula_functions(row:FormulaRow) -> list[Callable]:
+    """``row``'s formula plus every helper function reachable through its closure."""
+    functions = []
+    seen = set()
+    pending = [row.formula]
+    while pending:
+        func = pending.pop()
+        if id(func) in seen:
+            continue
+        seen.add(id(func))
+        functions.append(func)
+        for cell in getattr(func, '__closure__', None) or ():
+            try:
+                value = cell.cell_contents
+            except ValueError:
+                continue
+            if inspect.isfunction(value):
+                pending.append(value)
+    return functions
+
+def referenced_rows(row:FormulaRow) -> list[FormulaRow]:
+    """Operands of expression and recurrence rows, and rows captured in the closure of any other formula (or its helper functions)."""
+    if isinstance(row, (ExpressionRow, RecurrenceRow)):
+        return [operand for operand in row.operands if isinstance(operand, FormulaRow)]
+    found = []
+    for func in formula_functions(row):
+        for cell in func.__closure__ or ():
+            try:
+                value = cell.cell_contents
+            except ValueError:
+                continue
+            if isinstance(value, FormulaRow) and value is not row:
+                found.append(value)
+    return found
+
+def reachable_rows(rows) -> list[FormulaRow]:
+    """``rows`` and every row they reference, directly or not (``referenced_rows``), each once."""
+    found = {}
+    pending = list(rows)
+    while pending:
+        row = pending.pop()
+        if id(row) not in found:
+            found[id(row)] = row
+            pending += referenced_rows(row)
+    return list(found.values())
+
+def formula_names(row:FormulaRow) -> set[str]:
+    """Global and attribute names used by ``row``'s formula and its helper functions (``self.fondos_eop`` -> ``fondos_eop``)."""
+    names = set()
+    for func in formula_functions(row):
+        codes = [func.__code__]
+        while codes:
+            code = codes.pop()
+            names.update(code.co_names)
+            codes.extend(const for const in code.co_consts if inspect.iscode(const))
+    return names
+
+def input_fields(row:FormulaRow, fields:set[str]) -> set[str]:
+    """Input fields ``row`` reads when evaluated: the attribute names used by its formula (and helper
+    functions) that are also input fields. Values read from the inputs at build time are not seen."""
+    if isinstance(row, InputRow):
+        return {row.field} & fields
+    return formula_names(row) & fields
+
+def expression_key(row:FormulaRow, keys:dict) -> tuple:
+    """Structural key of an expression row (operation and operand keys), memoized in ``keys`` by row id."""
+    if not isinstance(row, ExpressionRow):
+        return ('row', id(row))
+    if id(row) not in keys:
+        operands = [expression_key(operand, keys) if isinstance(operand, FormulaRow) else
+                    (('array', id(operand)) if isinstance(operand, np.ndarray) else ('const', operand))
+                    for operand in row.operands]
+        if row.operation in ExpressionRow.commutative:
+            operands.sort(key=repr)
+        keys[id(row)] = (row.operation, *operands)
+    return keys[id(row)]
+
+class EvaluationPlan:
+    """Non-recursive, period-stepped evaluation of a model's rows.
+
+    ``compile`` evaluates the model once while recording which rows each row reads and with
+    what lag (0 for the same period, 1 for ``t-1``...). The same-period dependencies give a
+    topological order, and ``run`` then fills every row one period at a time into a
+    preallocated ``(rows, periods)`` array, so recurrences like ``fondos_bop -> fondos_eop(t-1)``
+    only ever look one step back instead of recursing to t=0.
+
+    Batched models (``model.scenarios = N``) use a ``(rows, periods, N)`` array instead and every
+    formula call works on the ``N`` scenario values of a period at once.
+
+    Only rows that take part in a recurrence (a cycle through ``t-1`` reads) are stepped period by
+    period. Every other row is evaluated on its own over all periods once the rows it reads are
+    complete, and expression rows as a single NumPy operation over the whole period array. Formula
+    rows that only read other rows in the same period are first tried with ``t`` as an array of
+    periods (what ``where``/``maximum``/``minimum`` formulas already support for scenarios); rows
+    whose formula cannot take it (``if t > 0``, ``max``...) fall back to one call per period.
+    """
+    trace_periods = 2
+
+    def __init__(self, model:"Model"):
+        # The model owns the plan, a strong back reference would make every model a reference cycle
+        self.model = weakref.proxy(model)
+        self.periods = model.periods
+        self.scenarios = model.scenarios
+        rows: list[FormulaRow] = []
+        names: list[str|None] = []
+        found = set()
+        # Rule conditions need not be attributes of the model
+        entries = [(name, row) for name, row, index in model.ordered_rows]
+        entries += [(None, row) for rule in model.rules.values() for row in rule.rows()]
+        for name, row in entries:
+            if id(row) not in found:
+                found.add(id(row))
+                rows.append(row)
+                names.append(name)
+        # Anonymous rows (operator results, helpers) are found through the formulas' closures
+        pending = list(rows)
+        while pending:
+            for dependency in referenced_rows(pending.pop()):
+                if id(dependency) not in found:
+                    found.add(id(dependency))
+                    rows.append(dependency)
+                    names.append(None)
+                    pending.append(dependency)
+
+        # Common subexpression elimination: expression rows with the same operation and operands
+        # (``1 + inflaccion_acumulada`` built in six places) share one slot
+        keys = {}
+        self.rows: list[FormulaRow] = []
+        self.names: list[str|None] = []
+        self.aliases: list[FormulaRow] = []
+        self.positions: dict[int, int] = {}
+        self.slots: dict[str, int] = {}
+        canonical = {}
+        for row, name in zip(rows, names):
+            row_key = expression_key(row, keys)
+            if row_key in canonical:
+                self.aliases.append(row)
+            else:
+                canonical[row_key] = len(self.rows)
+                self.rows.append(row)
+                self.names.append(name)
+            self.positions[id(row)] = canonical[row_key]
+            if name is not None:
+                self.slots.setdefault(name, canonical[row_key])
+        shape = (len(self.rows), self.periods) if self.scenarios is None else (len(self.rows), self.periods, self.scenarios)
+        self.values = np.zeros(shape)
+        self.filled = [0] * len(self.rows)
+        self.dependencies: list[set[tuple[int, int]]] = [set() for _ in self.rows]
+        self.order: list[int] = []
+        self.t = -1
+        self._tracing = False
+        self._stack: list[int] = []
+        self._done: list[int] = []
+        self._completed: list[int] = []
+        self.dirty: dict[int, int] = {}
+        self._readers: list[set[tuple[int, int]]]|None = None
+        self._input_fields: list[set[str]]|None = None
+        self._blocks: list[tuple[str, list[int]]]|None = None
+        self._demand: dict[frozenset, tuple[set[int], list[tuple[str, list[int]]]]] = {}
+        self._running = False
+        self._scalar: set[int]|None = None
+        self._lists: set[int] = set()
+        self._read_shape: tuple[int, ...] = ()
+
+    def attach(self):
+        for slot, row in enumerate(self.rows):
+            row._plan = self
+            row._slot = slot
+        for row in self.aliases:
+            row._plan = self
+            row._slot = self.positions[id(row)]
+
+    def detach(self):
+        for row in self.rows + self.aliases:
+            if row._plan is self:
+                row._plan = None
+                row._slot = None
+
+    def compile(self, outputs:list|None = None, until:int|None = None) -> "EvaluationPlan":
+        """Trace the dependencies and evaluate (see ``run`` for ``outputs``/``until``)."""
+        self.attach()
+        self._tracing = True
+        self._done = [0] * len(self.rows)
+        self._completed = []
+        self.filled = [0] * len(self.rows)
+        order = range(len(self.rows))
+        completion = {}
+        try:
+            # Two periods are enough to see same-period and t-1 reads; rows named in formulas
+            # are added as dependencies statically (see readers) for branches not taken here
+            for t in range(min(self.periods, self.trace_periods)):
+                self.t = t
+                for slot in order:
+                    if self._done[slot] <= t:
+                        self._compute(self.rows[slot], t)
+                if t == 0:
+                    # The completion order of the first period is already a valid order: reuse it for
+                    # the remaining traced periods and to break ties in the topological sort
+                    completion = {slot: i for i, slot in enumerate(self._completed)}
+                    order = self._completed
+        finally:
+            self._tracing = False
+        self.order = self._topological_order(completion)
+        self.filled = self._done
+        return self.run(outputs, until)
+
+    def fork(self, model:"Model", fields:list[str]) -> "EvaluationPlan":
+        """Plan of ``model``, this plan's model rebuilt with input ``fields`` changed. The schedule traced by
+        ``compile`` is shared and the values copied, and only the rows reading ``fields`` (or not evaluated
+        yet here) and the rows downstream of them are left to evaluate."""
+        plan = EvaluationPlan(model)
+        if plan.names != self.names or any(type(row) is not type(other) for row, other in zip(plan.rows, self.rows)):
+            # build() made a different graph
+            return plan.compile()
+        # Slot-indexed and read-only once compiled (the demand cache only ever gets the same entries)
+        plan.order, plan.dependencies = self.order, self.dependencies
+        plan._readers, plan._blocks, plan._demand = self.readers(), self.blocks(), self._demand
+        plan._scalar, plan._lists = self.scalar_rows(), self._lists
+        plan.values = self.values.copy()
+        plan.filled = list(self.filled)
+        plan._input_fields = self._input_fields
+        stale = {slot for field in fields for slot in plan.input_readers(field)} | set(self.dirty)
+        self._input_fields = plan._input_fields
+        for slot in plan._downstream(stale):
+            plan.filled[slot] = 0
+        plan.attach()
+        return plan
+
+    def _topological_order(self, completion:dict[int, int]) -> list[int]:
+        readers = [[] for _ in self.rows]
+        pending = [0] * len(self.rows)
+        for slot, dependencies in enumerate(self.dependencies):
+            for dependency, lag in dependencies:
+                if lag == 0 and dependency != slot:
+                    readers[dependency].append(slot)
+                    pending[slot] += 1
+        ready = [(completion.get(slot, slot), slot) for slot, count in enumerate(pending) if count == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            _, slot = heapq.heappop(ready)
+            order.append(slot)
+            for reader in readers[slot]:
+                pending[reader] -= 1
+                if pending[reader] == 0:
+                    heapq.heappush(ready, (completion.get(reader, reader), reader))
+        if len(order) != len(self.rows):
+            cyclic = [self.names[slot] or f"<row {slot}>" for slot, count in enumerate(pending) if count]
+            raise ValueError(f"Circular same-period reference between rows: {', '.join(cyclic)}")
+        return order
+
+    def _compute(self, row:FormulaRow, t:int):
+        slot = row._slot
+        if self._tracing:
+            if self._stack:
+                self.dependencies[self._stack[-1]].add((slot, 0))
+            self._stack.append(slot)
+            try:
+                value = row.initial if (t == 0 and row.initial is not None) else row.formula(row, t)
+            finally:
+                self._stack.pop()
+            self.values[slot, t] = value
+            self._done[slot] = t + 1
+            if t == 0:
+                self._completed.append(slot)
+            return self.values[slot, t]
+        value = row.initial if (t == 0 and row.initial is not None) else row.formula(row, t)
+        self.values[slot, t] = value
+        self.filled[slot] = t + 1
+        return self.values[slot, t]
+
+    def lookup(self, row:FormulaRow, t:int):
+        slot = row._slot
+        if self._tracing:
+            if 0 <= t < self._done[slot]:
+                if self._stack:
+                    self.dependencies[self._stack[-1]].add((slot, self.t - t))
+                return self.values[slot, t]
+            if t == self.t:
+                return self._compute(row, t)
+        elif not self._running:
+            if 0 <= t < self.periods:
+                # Read from outside an evaluation, of a row a pruned run left out: evaluate it on demand
+                self.run([slot])
+                return self.values[slot, t]
+        elif t == self.t and self.filled[slot] == t:
+            return self._compute(row, t)
+        # Outside the stepped window (t<0, future periods): fall back to the lazy path
+        return row.lazy(t)
+
+    def reset(self):
+        self.filled = [0] * len(self.rows)
+        self.dirty = {}
+        self.t = -1
+
+    def readers(self) -> list[set[tuple[int, int]]]:
+        """Reverse of ``dependencies``: ``(reader, lag)`` for the rows that read each row.
+
+        Traced edges only cover the branches taken while compiling, so rows named in a formula
+        (``self.hipoteca_eop``) or captured by it are added too, with a conservative lag of 0.
+        """
+        if self._readers is None:
+            self._readers = [set() for _ in self.rows]
+            for slot, dependencies in enumerate(self.dependencies):
+                for dependency, lag in dependencies:
+                    self._readers[dependency].add((slot, lag))
+            for slot, row in enumerate(self.rows):
+                static = {self.slots[name] for name in formula_names(row) if name in self.slots}
+                static.update(self.positions[id(dependency)] for dependency in referenced_rows(row))
+                for dependency in static - {slot}:
+                    if not any(reader == slot for reader, lag in self._readers[dependency]):
+                        self._readers[dependency].add((slot, 0))
+        return self._readers
+
+    def input_readers(self, field:str) -> list[int]:
+        """Rows whose formula reads input ``field``."""
+        if self._input_fields is None:
+            fields = {field.name for field in dataclasses.fields(self.model.inputs)}
+            self._input_fields = [input_fields(row, fields) for row in self.rows]
+        return [slot for slot, fields in enumerate(self._input_fields) if field in fields]
+
+    def invalidate(self, slots:list[int], period:int = 0):
+        """Mark ``slots`` as stale from ``period`` onward. The next ``run`` recomputes them and
+        propagates to the rows downstream, but only from the first period whose value actually changed."""
+        for slot in slots:
+            self.dirty[slot] = min(self.dirty.get(slot, period), period)
+
+    def _downstream(self, slots) -> set[int]:
+        readers = self.readers()
+        pending = list(slots)
+        seen = set(pending)
+        while pending:
+            for reader, lag in readers[pending.pop()]:
+                if reader not in seen:
+                    seen.add(reader)
+                    pending.append(reader)
+        return seen
+
+    def _propagate(self):
+        """Spreadsheet-style recalculation of the dirty rows and the rows downstream of them.
+
+        A downstream row is only recomputed from the first period in which one of the rows it reads
+        changed (shifted by the lag of the read), so a change that only shows from 2040 onward leaves
+        every earlier period untouched.
+        """
+        dirty, self.dirty = self.dirty, {}
+        candidates = self._downstream(dirty)
+        dependencies = {slot: [] for slot in candidates}
+        for slot in candidates:
+            self.rows[slot].clear()
+            for reader, lag in self.readers()[slot]:
+                if reader in candidates:
+                    dependencies[reader].append((slot, lag))
+        order = [slot for slot in self.order if slot in candidates]
+        never = self.periods
+        changed = {slot: never for slot in candidates}
+        values = self.values
+        for t in range(min(dirty.values()), self.periods):
+            self.t = t
+            for slot in order:
+                since = dirty.get(slot, never)
+                for dependency, lag in dependencies[slot]:
+                    since = min(since, changed[dependency] + lag)
+                if t < since:
+                    continue
+                row = self.rows[slot]
+                previous = values[slot, t].copy()
+                value = row.initial if (t == 0 and row.initial is not None) else row.formula(row, t)
+                values[slot, t] = value
+                if changed[slot] == never and not np.array_equal(values[slot, t], previous):
+                    changed[slot] = t
+
+    def blocks(self) -> list[tuple[str, list[int]]]:
+        """Evaluation schedule: strongly connected components of the dependency graph in
+        dependency order, as ``('vector', [expression row])``, ``('recurrence', [RecurrenceRow])``, ``('row', [row])``
+        or ``('stepped', [rows of a recurrence in same-period order])``."""
+        if self._blocks is not None:
+            return self._blocks
+        dependencies = [set() for _ in self.rows]
+        for slot, readers in enumerate(self.readers()):
+            for reader, lag in readers:
+                dependencies[reader].add(slot)
+        # Tarjan (iterative): components come out after every component they depend on
+        index, low, on_stack, stack, components = {}, {}, set(), [], []
+        for root in range(len(self.rows)):
+            if root in index:
+                continue
+            work = [(root, iter(dependencies[root]))]
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, edges = work[-1]
+                for dependency in edges:
+                    if dependency not in index:
+                        index[dependency] = low[dependency] = len(index)
+                        stack.append(dependency)
+                        on_stack.add(dependency)
+                        work.append((dependency, iter(dependencies[dependency])))
+                        break
+                    if dependency in on_stack:
+                        low[node] = min(low[node], index[dependency])
+                else:
+                    work.pop()
+                    if work:
+                        low[work[-1][0]] = min(low[work[-1][0]], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        components.append(component)
+        position = {slot: i for i, slot in enumerate(self.order)}
+        self._blocks = []
+        for component in components:
+            if len(component) > 1:
+                self._blocks.append(('stepped', sorted(component, key=position.__getitem__)))
+            elif isinstance(self.rows[component[0]], ExpressionRow):
+                self._blocks.append(('vector', component))
+            elif isinstance(self.rows[component[0]], RecurrenceRow):
+                self._blocks.append(('recurrence', component))
+            else:
+                self._blocks.append(('row', component))
+        return self._blocks
+
+    def demand(self, slots:list[int]) -> tuple[set[int], list[tuple[str, list[int]]]]:
+        """Rows ``slots`` need (themselves and every row upstream of them) and the blocks containing them."""
+        key = frozenset(slots)
+        if key not in self._demand:
+            sources = [[] for _ in self.rows]
+            for slot, readers in enumerate(self.readers()):
+                for reader, lag in readers:
+                    sources[reader].append(slot)
+            needed = set(key)
+            pending = list(key)
+            while pending:
+                for source in sources[pending.pop()]:
+                    if source not in needed:
+                        needed.add(source)
+                        pending.append(source)
+            self._demand[key] = needed, [block for block in self.blocks() if needed.intersection(block[1])]
+        return self._demand[key]
+
+    def run(self, outputs:list|None = None, until:int|None = None) -> "EvaluationPlan":
+        """Evaluate the rows that are not up to date. ``outputs`` (rows, names or slots) restricts it to
+        those rows and the rows they depend on, ``until`` to the first ``until`` periods."""
+        self.attach()
+        self._running = True
+        try:
+            return self._run(outputs, until)
+        finally:
+            self._running = False
+
+    def _run(self, outputs:list|None, until:int|None) -> "EvaluationPlan":
+        filled = self.filled
+        periods = self.periods if until is None else min(until, self.periods)
+        if outputs is None:
+            needed, blocks = None, self.blocks()
+        else:
+            needed, blocks = self.demand([output if isinstance(output, int) else
+                                          self.slots[output] if isinstance(output, str) else self.positions[id(output)]
+                                          for output in outputs])
+        if self.dirty:
+            if needed is None and min(filled) == self.periods:
+                self._propagate()
+            else:
+                for slot in self._downstream(self.dirty):
+                    filled[slot] = min(filled[slot], min(self.dirty.values()))
+                    self.rows[slot].clear()
+                self.dirty = {}
+        if min((filled[slot] for slot in (needed if needed is not None else range(len(filled)))), default=periods) >= periods:
+            return self
+        rows = self.rows
+        for kind, slots in blocks:
+            start = min(filled[slot] for slot in slots)
+            if start >= periods:
+                continue
+            if kind == 'vector':
+                self._vector(rows[slots[0]], start, periods)
+            elif kind == 'recurrence':
+                self._recurrence(rows[slots[0]], start, periods)
+            elif kind == 'row' and periods - start > 1 and self._vector_row(rows[slots[0]], start, periods):
+                continue
+            else:
+                self._step(slots, start, periods)
+        return self
+
+    def _step(self, slots:list[int], start:int, stop:int):
+        """Evaluate ``slots`` (a row, or the rows of a recurrence in same-period order) one period at a time."""
+        values, filled = self.values, self.filled
+        block = [(slot, self.rows[slot], self.rows[slot].formula, self.rows[slot].initial) for slot in slots]
+        for t in range(start, stop):
+            self.t = t
+            for slot, row, formula, initial in block:
+                if filled[slot] <= t:
+                    values[slot, t] = initial if (t == 0 and initial is not None) else formula(row, t)
+                    filled[slot] = t + 1
+
+    def scalar_rows(self) -> set[int]:
+        """Formula rows evaluated one period at a time: rows reading other periods (their own or
+        another row's). Rows that fail with a period array are added as they are found."""
+        if self._scalar is None:
+            self._scalar = {slot for slot in range(len(self.rows))
+                            if any(lag != 0 or dependency == slot for dependency, lag in self.dependencies[slot])}
+            # List inputs (``nacimiento_hijos``, ``(scenarios, k)`` in batches) take the last axis
+            inputs = getattr(self.model, 'inputs', None)
+            if dataclasses.is_dataclass(inputs):
+                scalar_ndim = 0 if self.scenarios is None else 1
+                lists = {field.name for field in dataclasses.fields(inputs) if np.ndim(getattr(inputs, field.name)) > scalar_ndim}
+                self._lists = {slot for slot, row in enumerate(self.rows) if lists and input_fields(row, lists)}
+        return self._scalar
+
+    def read(self, row:FormulaRow, t:np.ndarray):
+        """Values of ``row`` at the periods in array ``t``, which must all be evaluated already."""
+        periods = t.ravel()
+        if periods.min() < 0 or periods.max() >= self.filled[row._slot]:
+            raise IndexError(f"Periods {periods.min()}..{periods.max()} of row {row._slot} are not evaluated")
+        return self.values[row._slot, periods].reshape((len(periods),) + self._read_shape[1:])
+
+    def _vector_row(self, row:FormulaRow, start:int, stop:int) -> bool:
+        """Evaluate formula ``row`` for periods ``start:stop`` in one call with ``t`` as an array of periods.
+
+        Periods go on the first axis, then scenarios (batched models) and, for rows reading list
+        inputs, a last axis of length one for the list to broadcast along, so ``t`` and the rows read
+        through it have shape ``(periods, 1...)``/``(periods[, scenarios][, 1])``. The result must
+        come out as ``(periods[, scenarios])`` (or broadcast to it); a result with fewer axes than that
+        lost the period axis's place (a sum over a list input shared by every scenario gives ``(periods,)``,
+        which would broadcast along scenarios when there are as many as periods), so it is refused too.
+        False if the row can't do it."""
+        slot = row._slot
+        values = self.values
+        if slot in self.scalar_rows():
+            return False
+        shape = values[slot, start:stop].shape
+        self._read_shape = shape + (1,) if slot in self._lists else shape
+        t = np.arange(start, stop).reshape((-1,) + (1,)*(len(self._read_shape) - 1))
+        try:
+            result = row.formula(row, t)
+            if 0 < np.ndim(result) < len(shape):
+                raise ValueError(f"Result of shape {np.shape(result)} for periods and scenarios {shape}")
+            values[slot, start:stop] = np.broadcast_to(result, shape)
+        except Exception:
+            self._scalar.add(slot)
+            return False
+        if start == 0 and row.initial is not None:
+            values[slot, 0] = row.initial
+        self.filled[slot] = stop
+        return True
+
+    def _vector(self, row:"ExpressionRow", start:int, stop:int):
+        """Evaluate expression ``row`` for periods ``start:stop`` as one NumPy operation over the period axis."""
+        values = self.values
+        left, right = (values[operand._slot, start:stop] if isinstance(operand, FormulaRow) else operand
+                       for operand in row.operands)
+        values[row._slot, start:stop] = ExpressionRow.operations[row.operation](left, right)
+        self.filled[row._slot] = stop
+
+    def _recurrence(self, row:RecurrenceRow, start:int, stop:int):
+        """Evaluate recurrence ``row`` for periods ``start:stop`` with its ``scan``."""
+        values = self.values
+        shape = values[row._slot, start:stop].shape
+        operands = [np.broadcast_to(values[operand._slot, start:stop] if isinstance(operand, FormulaRow) else operand, shape)
+                    for operand in row.operands]
+        t = np.arange(start, stop).reshape((-1,) + (1,)*(len(shape) - 1))
+        previous = values[row._slot, start - 1] if start > 0 else None
+        values[row._slot, start:stop] = row.scan(t, previous, *operands)
+        self.filled[row._slot] = stop
+
+    def row_values(self, slot:int) -> dict[int, float]:
+        return period_values(self.values[slot], self.rows[slot].format)
+
+class ModelResult:
+    """Values of a model's named rows in one contiguous float64 array ``values``, ``(rows, periods[, scenarios])``,
+    indexed by row name, with each row's group and format and the period labels. Rows, groups of consecutive
+    rows and the NumPy/pandas/Arrow conversions are views of ``values`` rather than copies wherever the layout allows."""
+    def __init__(self, names:list[str], groups:list[str], formats:list[str], periods:list, values:np.ndarray):
+        self.names = names
+        self.groups = groups
+        self.formats = formats
+        self.periods = periods
+        self.values = np.ascontiguousarray(values, dtype=float)
+        self.index = {name: i for i, name in enumerate(names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name:str):
+        return name in self.index
+
+    def __getitem__(self, name:str) -> np.ndarray:
+        return self.row(name)
+
+    @property
+    def scenarios(self) -> int|None:
+        return self.values.shape[2] if self.values.ndim == 3 else None
+
+    def row(self, name:str) -> np.ndarray:
+        """Values of row ``name``, ``(periods[, scenarios])``."""
+        return self.values[self.index[name]]
+
+    def group(self, group:str) -> "ModelResult":
+        """The rows of ``group``, a view when they are consecutive (as ``set_group`` defines them)."""
+        positions = [i for i, row_group in enumerate(self.groups) if row_group == group]
+        if not positions:
+            raise KeyError(group)
+        selection = slice(positions[0], positions[-1] + 1) if positions[-1] - positions[0] + 1 == len(positions) else positions
+        return ModelResult([self.names[i] for i in positions], [group]*len(positions),
+                           [self.formats[i] for i in positions], self.periods, self.values[selection])
+
+    def to_numpy(self) -> np.ndarray:
+        return self.values
+
+    def to_pandas(self) -> "pd.DataFrame":
+        """One line per row (``Categoria``, ``Concepto``) and one column per period, or per period and scenario."""
+        import pandas as pd
+        index = pd.MultiIndex.from_arrays([self.groups, self.names], names=["Categoria", "Concepto"])
+        if self.scenarios is None:
+            columns = pd.Index(self.periods)
+        else:
+            columns = pd.MultiIndex.from_product([self.periods, range(self.scenarios)], names=["Periodo", "Escenario"])
+        return pd.DataFrame(self.values.reshape(len(self.names), -1), index=index, columns=columns, copy=False)
+
+    def to_arrow(self):
+        """``pyarrow.Table`` with one column per row and one line per period (and scenario)."""
+        import pyarrow as pa
+        scenarios = self.scenarios or 1
+        columns = {'periodo': pa.array(np.repeat(np.asarray(self.periods), scenarios))}
+        if self.scenarios is not None:
+            columns['escenario'] = pa.array(np.tile(np.arange(scenarios), len(self.periods)))
+        # Each row is contiguous, so Arrow wraps its buffer without copying
+        columns.update({name: pa.array(self.values[i].reshape(-1)) for i, name in enumerate(self.names)})
+        return pa.table(columns)
+
+def period_values(values:np.ndarray, format:str) -> dict[int, float]:
+    """``{t: value}`` of one row's ``(periods,)`` or ``(periods, scenarios)`` array, as ``RowData`` holds them."""
+    if format == Formats.boolean:
+        values = values.astype(bool)
+    if values.ndim > 1:
+        return dict(enumerate(values))
+    return dict(enumerate(values.tolist()))
+
+class TableStyle:
+    """Presentation of a model's rows in the HTML table: labels, group spans and borders, stripes and
+    highlight/percentage/boolean masks. It only depends on the row definitions, so it is built once
+    and reused for every set of values (e.g. every scenario of a batch) rendered with those rows."""
+    table_class = "model-table"
+    number_formats = ("{:,.0f}", "{:,.1f}", "({:,.0f})", "({:,.1f})")
+
+    def __init__(self, rows:dict[str, FormulaRow]):
+        self.names = list(rows)
+        definitions = list(rows.values())
+        groups = np.array([row.group if row.group is not None else "" for row in definitions], dtype=object)
+        self.percentage = np.array([row.format == Formats.percentage for row in definitions], dtype=bool)
+        self.boolean = np.array([row.format == Formats.boolean for row in definitions], dtype=bool)
+        highlight = np.array([bool(row.highlight) for row in definitions], dtype=bool)
+
+        border = np.zeros(len(definitions), dtype=bool)
+        border[1:] = groups[1:] != groups[:-1]
+        stripes = np.where(highlight, "h", np.where(np.arange(len(definitions)) % 2 == 0, "a", "d")).astype(object)
+        borders = np.where(border, " g", "").astype(object)
+        self.row_classes = stripes + borders + np.where(self.percentage, " p", "").astype(object)
+        self.borders = borders
+
+        starts = np.flatnonzero(np.r_[True, border[1:]])
+        spans = np.diff(np.r_[starts, len(definitions)])
+        group_cells = dict(zip(starts.tolist(), (f'<th class="level0" rowspan="{span}">{html.escape(groups[start])}</th>'
+                                                  for start, span in zip(starts.tolist(), spans.tolist()))))
+        self.headings = [f'<tr>{group_cells.get(i, "")}<th class="level1 {stripes[i] + borders[i]}">{html.escape(label_format(name))}</th>'
+                         for i, name in enumerate(self.names)]
+
+    @classmethod
+    def stylesheet(cls, compact:bool = False) -> str:
+        """``compact`` adds the small print layout used by ``Model.to_html``."""
+        table = f"table.{cls.table_class}"
+        rules = [
+            (f"{table} th.level0", Styles.index_headers),
+            (f"{table} th.col_heading", Styles.column_headers),
+            (f"{table} th.index_name", Styles.column_headers),
+            (f"{table} .blank", Styles.blank_headers),
+            (f"{table} .d", Styles.default),
+            (f"{table} .a", Styles.default_alternate),
+            (f"{table} .h", Styles.highlight_1),
+            (f"{table} .t", Styles.bool_true),
+            (f"{table} .f", Styles.bool_false),
+            (f"{table} .p", "font-style: italic;"),
+            (f"{table} .g", "border-top: 2px solid #000000;"),
+            (f"{table} th.level1", "text-align: left;"),
+        ]
+        if compact:
+            rules += [
+                (f"{table} th, {table} td", "font-family: Verdana, Geneva, sans-serif; font-size: 8px; border: none; padding: 2px;"),
+                (table, "border-collapse: collapse; border: none; padding: 0px;"),
+            ]
+        return "<style>\n" + "\n".join(f"{selector} {{{props}}}" for selector, props in rules) + "\n</style>\n"
+
+    def cells(self, values:np.ndarray) -> list[str]:
+        """``<td>`` cells of every row for ``values`` of shape ``(rows, periods)``. Formats (``table_format``,
+        percentage, boolean) and cell classes are picked with masks over the whole table at once."""
+        values = np.asarray(values, dtype=float)
+        with np.errstate(invalid='ignore'):
+            absolute = np.abs(values)
+            kind = (np.abs(np.round(values) - values) > 0.1) + 2*(values < 0)
+            small = absolute < 0.1
+        formats = self.number_formats
+        text = np.array([formats[k].format(a) for k, a in zip(kind.ravel().tolist(), absolute.ravel().tolist())],
+                        dtype=object).reshape(values.shape)
+        text[small] = "-"
+        if self.percentage.any():
+            text[self.percentage] = [["{:.1%}".format(value) for value in row] for row in values[self.percentage].tolist()]
+        classes = np.broadcast_to(self.row_classes[:, None], values.shape).astype(object)
+        if self.boolean.any():
+            truth = values[self.boolean] != 0
+            text[self.boolean] = np.where(truth, "TRUE", "FALSE")
+            classes[self.boolean] = np.where(truth, "t", "f").astype(object) + self.borders[self.boolean][:, None]
+        cells = '<td class="' + classes + '">' + text + "</td>"
+        return ["".join(row) for row in cells.tolist()]
+
+    def write(self, stream, values:np.ndarray, columns:list, title:str|None = None):
+        """Write one table for ``values`` (``(rows, periods)``, rows in ``self.names`` order) to ``stream``."""
+        if title is not None:
+            stream.write(f"<h3>{html.escape(str(title))}</h3>\n")
+        stream.write(f'<table class="{self.table_class}">\n<thead>\n<tr><th class="blank">&nbsp;</th><th class="blank level0">&nbsp;</th>')
+        stream.write("".join(f'<th class="col_heading">{column}</th>' for column in columns))
+        stream.write('</tr>\n<tr><th class="index_name">Categoria</th><th class="index_name">Concepto</th>')
+        stream.write('<th class="blank">&nbsp;</th>'*len(columns))
+        stream.write("</tr>\n</thead>\n<tbody>\n")
+        for heading, cells in zip(self.headings, self.cells(values)):
+            stream.write(heading + cells + "</tr>\n")
+        stream.write("</tbody>\n</table>\n")
+
+
+class Table:
+    """Rendered view of a model returned by ``Model.show``, displayed as HTML in notebooks."""
+    def __init__(self, style:TableStyle, values:np.ndarray, columns:list, titles:list|None = None):
+        self.style = style
+        self.values = values
+        self.columns = columns
+        self.titles = titles
+
+    def write(self, stream, compact:bool = False):
+        stream.write(self.style.stylesheet(compact))
+        if self.values.ndim == 2:
+            self.style.write(stream, self.values, self.columns)
+            return
+        titles = self.titles if self.titles is not None else [f"Escenario {i}" for i in range(self.values.shape[2])]
+        for scenario, title in enumerate(titles):
+            self.style.write(stream, self.values[:, :, scenario], self.columns, title)
+
+    def to_html(self, filepath=None, compact:bool = False) -> str|None:
+        if filepath is None:
+            stream = io.StringIO()
+            self.write(stream, compact)
+            return stream.getvalue()
+        if hasattr(filepath, "write"):
+            self.write(filepath, compact)
+            return None
+        with open(filepath, "w", encoding="utf-8") as stream:
+            self.write(stream, compact)
+        return None
+
+    def _repr_html_(self) -> str:
+        return self.to_html()
+
+@dataclass
+class GoalSeekResult:
+    value: float|None
+    row_value: float|None
+    evaluations: int
+    converged: bool
+
+@dataclass
+class Rule:
+    """Boolean row ``condition`` that must hold in every period, or only in the periods where boolean row ``when``
+    holds: ``Rule(FormulaRow(lambda row,t: hipoteca_bop(t) <= 0), when=jubilado)`` is "no mortgage left once retired"."""
+    condition: FormulaRow
+    when: FormulaRow|None = None
+
+    def rows(self) -> list[FormulaRow]:
+        return [self.condition] if self.when is None else [self.condition, self.when]
+
+    def violations(self, plan:"EvaluationPlan", start:int, stop:int) -> np.ndarray:
+        """Mask of the periods ``start:stop`` (``(periods[, scenarios])``) where the rule fails."""
+        values = plan.values
+        failed = values[plan.positions[id(self.condition)], start:stop] == 0
+        if self.when is not None:
+            failed &= values[plan.positions[id(self.when)], start:stop] != 0
+        return failed
+
+@dataclass
+class RuleCheck:
+    """Result of ``Model.check``. ``first_violation[rule]`` is the first period index where the rule fails, -1 if
+    it holds in every period checked (arrays over scenarios for batched models). ``periods`` is the number of
+    periods evaluated, fewer than the model's if the check stopped early."""
+    first_violation: dict[str, int|np.ndarray]
+    periods: int
+
+    @property
+    def passed(self) -> dict[str, bool|np.ndarray]:
+        return {name: first < 0 for name, first in self.first_violation.items()}
+
+    @property
+    def feasible(self) -> bool|np.ndarray:
+        """Whether every rule holds, per scenario for batched models."""
+        feasible = np.all([first < 0 for first in self.first_violation.values()], axis=0)
+        return bool(feasible) if np.ndim(feasible) == 0 else feasible
+
+    def __bool__(self) -> bool:
+        # ``if model.check():`` as before ``check`` returned a RuleCheck
+        feasible = self.feasible
+        if isinstance(feasible, np.ndarray):
+            raise ValueError("The check of a batched model has one result per scenario, use feasible.all() or feasible.any()")
+        return feasible
+
+@dataclass
+class Sensitivities:
+    """Central-difference derivatives of model rows with respect to input fields.
+
+    ``values[row]`` are the base values and ``derivatives[field][row]`` the ``d(row, t)/d(field)``
+    arrays, both over periods. ``steps[field]`` is the perturbation used for each field."""
+    periods: list[int]
+    values: dict[str, np.ndarray]
+    derivatives: dict[str, dict[str, np.ndarray]]
+    steps: dict[str, float]
+
+    def df(self, row:str) -> "pd.DataFrame":
+        """``d(row, t)/d(field)`` with one line per field and one column per period."""
+        import pandas as pd
+        return pd.DataFrame({field: derivatives[row] for field, derivatives in self.derivatives.items()}, index=self.periods).T
+
 class Model():
+    # Input fields that act as switches (years), left out of ``sensitivities`` by default
+    discrete_inputs:tuple[str, ...] = ()
+    # Length of a period (``Granularity.month``: ``periods`` counts months, ``initial_period`` is still a year).
+    # Setting it sets ``periods_per_year`` too, a plain attribute because formulas read it every period
+    granularity:str = Granularity.year
+    periods_per_year:int = 1
 
-    __protected_attrnames = ['periods', 'initial_period', 'group_label', '__protected_attrnames', 'row_index', 'ordered_rows']
+    __protected_attrnames = ['periods', 'initial_period', 'granularity', 'group_label', '__protected_attrnames', 'row_index', 'ordered_rows', 'plan', 'scenarios', 'overrides', 'result_cache', 'rules']
 
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
@@ -136,6 +1287,12 @@ class Model():
         self.group_label = None
         self.row_index = 0
         self.ordered_rows:list[dict] = []
+        self.plan:EvaluationPlan|None = None
+        self.scenarios:int|None = None
+        self.overrides:dict[str, FormulaRow] = {}
+        self.rules:dict[str, Rule] = {}
+        # Optional ResultCache (models.cache) consulted before evaluating
+        self.result_cache = None
         self.periods = 5
         self.initial_period = 2025
 
@@ -145,14 +1302,41 @@ class Model():
             if name in Model.__protected_attrnames:
                 raise ValueError(f"Attribute name cannot be any of: {', '.join(Model.__protected_attrnames)}")
             else:
+                if name in self.__dict__.get('overrides', {}):
+                    # build() defines the row but an override replaces it, keeping its presentation
+                    override = self.overrides[name]
+                    override.format, override.highlight = value.format, value.highlight
+                    value = override
                 if self.group_label is not None:
                     value.group = self.group_label
+                # A new row changes the graph, the compiled plan has to be rebuilt
+                if self.__dict__.get('plan') is not None:
+                    self.plan.detach()
+                    self.plan = None
                 super().__setattr__(name, value)
                 self.ordered_rows.append((name, value, self.row_index))
                 self.row_index += 1
         else:
+            if name == 'granularity':
+                super().__setattr__('periods_per_year', Granularity.periods_per_year[value])
+            elif name == 'inputs' and dataclasses.is_dataclass(value):
+                # A copy of its own, which set_input changes instead of the caller's dataclass
+                value = dataclasses.replace(value)
             super().__setattr__(name, value)
 
+    def override(self, name:str, row:FormulaRow):
+        """Use ``row`` for ``name`` instead of the row ``build()`` defines. Must be called before ``build()``
+        so every formula and operator row picks up the replacement (e.g. a ``StochasticRow`` for a rate)."""
+        self.overrides[name] = row
+
+    def rule(self, name:str, condition:FormulaRow, when:FormulaRow|None = None):
+        """Declare rule ``name``: boolean row ``condition`` must hold in every period (where ``when`` holds).
+        Checked by ``check``."""
+        self.rules[name] = Rule(condition, when)
+        if self.plan is not None:
+            self.plan.detach()
+            self.plan = None
+
     def set_group(self, group_label:str):
         self.group_label = group_label
 
@@ -160,40 +1344,380 @@ class Model():
         self.group_label = None
 
     def period(self, t):
-        return self.initial_period + t
+        """Year of period ``t`` (the twelve months of a year share it at monthly granularity)."""
+        return self.initial_period + t//self.periods_per_year
+
+    def month(self, t):
+        """Month (1-12) of period ``t``, always 1 for yearly models."""
+        return t % self.periods_per_year + 1
+
+    def year_start(self, t):
+        """Whether ``t`` is the first period of its year: one-off amounts in a year (a purchase) go there."""
+        return t % self.periods_per_year == 0
+
+    def period_label(self, t):
+        """Column label of period ``t``: the year (``2026``), or ``"2026-01"`` for monthly models."""
+        if self.periods_per_year == 1:
+            return self.period(t)
+        return f"{self.period(t)}-{self.month(t):02d}"
+
+    def period_labels(self) -> list:
+        return [self.period_label(t) for t in range(self.periods)]
+
+    def rate(self, annual):
+        """Per-period rate compounding to the ``annual`` rate over a year."""
+        periods_per_year = self.periods_per_year
+        return annual if periods_per_year == 1 else (1 + annual)**(1/periods_per_year) - 1
+
+    def per_period(self, annual):
+        """Share of a yearly amount falling in one period."""
+        return annual/self.periods_per_year
     
     def get_rows(self) -> dict[str, FormulaRow]:
         return {name:row for name, row, index in self.ordered_rows}
 
-    def get_data(self) -> list[RowData]:
+    @classmethod
+    def batch(cls, inputs, **kwargs) -> "Model":
+        """Build one model that evaluates N input sets at once.
+
+        ``inputs`` is a list of inputs dataclasses or a DataFrame with one column per field
+        (``cls.inputs_type`` gives the dataclass). Every row then holds an array over scenarios,
+        so the per-scenario Python cost is paid once for the whole batch. Formulas must be
+        written in vectorizable form (``where``/``maximum``/``minimum`` instead of ``if``/``max``/``min``).
+        """
+        stacked, scenarios = stack_inputs(inputs, getattr(cls, 'inputs_type', None))
+        model = cls(stacked, **kwargs)
+        model.scenarios = scenarios
+        model.build()
+        return model
+
+    def dispose(self):
+        """Release the plan arrays and every row. Formulas close over the model, so without this
+        a built model is a reference cycle that only the garbage collector can free."""
+        if self.plan is not None:
+            self.plan.detach()
+            self.plan = None
+        for name, row, index in self.ordered_rows:
+            row.clear()
+            self.__dict__.pop(name, None)
+        self.ordered_rows = []
+        self.overrides = {}
+        self.rules = {}
+        self.row_index = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.dispose()
+
+    def compile(self, outputs:list|None = None, until:int|None = None) -> EvaluationPlan:
+        """Build (once) the period-stepped evaluation plan used by ``get_data``/``df``."""
+        if self.plan is None or self.plan.periods != self.periods or self.plan.scenarios != self.scenarios:
+            if self.plan is not None:
+                self.plan.detach()
+            self.plan = EvaluationPlan(self).compile(outputs, until)
+        return self.plan
+
+    def evaluate(self, outputs:list|None = None, periods=None) -> EvaluationPlan:
+        """Evaluate every row through the compiled plan and return it. Only rows invalidated
+        by ``set_input`` since the last evaluation are recomputed.
+
+        ``outputs`` (row names or rows) limits the work to those rows and the rows they depend on,
+        and ``periods`` (a period index ``t`` or several) stops after the last one. Rows left out are
+        evaluated on demand if they are read later.
+        """
+        until = None if periods is None else (periods + 1 if np.isscalar(periods) else max(periods) + 1)
+        plan = self.plan
+        if plan is None or plan.periods != self.periods or plan.scenarios != self.scenarios:
+            # Compiling evaluates already
+            return self.compile(outputs, until)
+        return plan.run(outputs, until)
+
+    def check(self, rules:list[str]|None = None, until:int|None = None, short_circuit:bool = True) -> RuleCheck:
+        """Check ``rules`` (every declared rule by default) over the first ``until`` periods (all by default).
+
+        Rules are boolean masks over the period array (and scenarios), and only the rows they depend on are
+        evaluated. With ``short_circuit`` periods are evaluated in growing chunks and the check stops once
+        every scenario fails some rule, so an infeasible scenario costs only the periods up to its violation.
+        The result is true if every rule holds (``if model.check():``), for single-scenario models.
+        """
+        selected = {name: self.rules[name] for name in (rules if rules is not None else self.rules)}
+        rows = [row for rule in selected.values() for row in rule.rows()]
+        periods = self.periods if until is None else min(until, self.periods)
+        first = {name: np.full(() if self.scenarios is None else self.scenarios, -1) for name in selected}
+        start, stop = 0, (min(periods, 8*self.periods_per_year) if short_circuit else periods)
+        while start < periods:
+            plan = self.evaluate(rows, stop - 1)
+            for name, rule in selected.items():
+                failed = rule.violations(plan, start, stop)
+                first[name] = np.where((first[name] < 0) & failed.any(axis=0), start + failed.argmax(axis=0), first[name])
+            if short_circuit and np.all(np.any([violation >= 0 for violation in first.values()], axis=0)):
+                break
+            start, stop = stop, min(periods, 2*stop)
+        return RuleCheck({name: int(violation) if self.scenarios is None else violation for name, violation in first.items()}, stop)
+
+    def fork(self, **inputs) -> "Model":
+        """Variant of this model with some input fields changed (``model.fork(year_jubilacion=2045)``), leaving
+        this one as it is. The variant is built again, since formulas close over their model and inputs, but takes
+        over the compiled plan: the evaluation schedule is shared, the values evaluated so far are copied and only
+        the rows reading the changed fields, and the rows downstream of them, are evaluated again. As with
+        ``set_input``, formulas must read the inputs when evaluated."""
+        if self.overrides:
+            raise ValueError("Models with overridden rows cannot be forked, the override rows would be shared")
+        child = self.variant(dataclasses.replace(self.inputs, **inputs))
+        child.build()
+        if self.plan is not None and self.plan.periods == child.periods and self.plan.scenarios == child.scenarios:
+            child.plan = self.plan.fork(child, list(inputs))
+        return child
+
+    def variant(self, inputs) -> "Model":
+        """Unbuilt model like this one (constructor arguments, granularity and periods included) with ``inputs``
+        instead of its own, and without its rows, plan, overrides or rules."""
+        rows = {name for name, row, index in self.ordered_rows}
+        # Not copy.copy, which goes through __reduce__ where subclasses (SpecModel) rebuild themselves
+        variant = object.__new__(type(self))
+        variant.__dict__.update({key: value for key, value in self.__dict__.items() if key not in rows})
+        variant.__dict__.update(inputs=inputs, group_label=None, row_index=0, ordered_rows=[], plan=None, overrides={}, rules={})
+        return variant
+
+    def set_input(self, field:str, value):
+        """Change one input without rebuilding: only the rows that read ``field`` and the rows
+        downstream of them are recomputed on the next evaluation. Formulas must read the input
+        when evaluated (``InputRow``, ``inputs.field`` inside the lambda) for the change to be seen. The
+        model's inputs are its own copy, the dataclass it was given is not changed."""
+        setattr(self.inputs, field, value)
+        if self.plan is not None:
+            self.plan.invalidate(self.plan.input_readers(field))
+        else:
+            # Rows read without a plan memoize their values, operator rows included
+            for row in reachable_rows(row for name, row, index in self.ordered_rows):
+                row.clear()
+
+    def goal_seek(self, input_field:str, target_row:str|FormulaRow, t:int, condition:Callable[[float], bool]|float,
+                  bounds:tuple[float, float], method:str|None = None, find:str = 'min', tol:float = 1e-6, max_iter:int = 100) -> "GoalSeekResult":
+        """Search ``input_field`` within ``bounds`` so that ``target_row(t)`` meets ``condition``.
+
+        - ``condition`` callable (``method='bisect'``): bisection for the boundary of a monotone condition,
+          returning the smallest (``find='min'``) or largest (``find='max'``) input value where it holds.
+          Integer bounds search integers only.
+        - ``condition`` number (``method='secant'``): secant method for ``target_row(t) == condition``, falling
+          back to bisection inside ``bounds`` when they bracket the target.
+        - ``condition`` number (``method='newton'``): Newton's method from the middle of ``bounds`` with the
+          derivative given by ``sensitivities``, kept while it halves the error (chord steps). ``evaluations``
+          counts the three scenarios of each derivative too.
+
+        The model is not rebuilt between evaluations, ``set_input`` only recomputes the rows that depend
+        on ``input_field``. The input is set back to its value before the search when it finishes
+        (``set_input`` the returned value to keep it).
+        """
+        original = getattr(self.inputs, input_field)
+        try:
+            return self._goal_seek(input_field, target_row, t, condition, bounds, method, find, tol, max_iter)
+        finally:
+            self.set_input(input_field, original)
+
+    def _goal_seek(self, input_field:str, target_row:str|FormulaRow, t:int, condition:Callable[[float], bool]|float,
+                   bounds:tuple[float, float], method:str|None, find:str, tol:float, max_iter:int) -> "GoalSeekResult":
+        method = method or ('bisect' if callable(condition) else 'secant')
+        row = getattr(self, target_row) if isinstance(target_row, str) else target_row
+        evaluations = 0
+
+        def evaluate(x):
+            nonlocal evaluations
+            evaluations += 1
+            self.set_input(input_field, x)
+            self.evaluate([row], t)
+            return row(t)
+
+        lo, hi = bounds
+        if method == 'bisect':
+            if not callable(condition):
+                raise ValueError("Bisection needs a condition callable")
+            integer = isinstance(lo, int) and isinstance(hi, int)
+            # Orient the search so the condition is False at `bad` and True at `good`
+            good, bad = (hi, lo) if find == 'min' else (lo, hi)
+            value = evaluate(bad)
+            if condition(value):
+                return GoalSeekResult(bad, value, evaluations, True)
+            if not condition(evaluate(good)):
+                return GoalSeekResult(None, None, evaluations, False)
+            for _ in range(max_iter):
+                if (abs(good - bad) <= 1) if integer else (abs(good - bad) <= tol):
+                    break
+                middle = (good + bad) // 2 if integer else (good + bad) / 2
+                if condition(evaluate(middle)):
+                    good = middle
+                else:
+                    bad = middle
+            value = evaluate(good)
+            return GoalSeekResult(good, value, evaluations, True)
+
+        if method == 'secant':
+            # Secant steps, kept inside the sign-change bracket when the bounds give one: a step leaving
+            # it bisects instead (without a bracket steps are only clamped to the bounds)
+            a, b = lo, hi
+            fa, fb = evaluate(a) - condition, evaluate(b) - condition
+            bracket = np.sign(fa) != np.sign(fb)
+            x0, f0, x1, f1 = a, fa, b, fb
+            for _ in range(max_iter):
+                if abs(f1) <= tol:
+                    return GoalSeekResult(x1, f1 + condition, evaluations, True)
+                x2 = x1 - f1*(x1 - x0)/(f1 - f0) if f1 != f0 else None
+                if bracket:
+                    if x2 is None or not min(a, b) < x2 < max(a, b):
+                        x2 = (a + b)/2
+                elif x2 is None or min(max(x2, lo), hi) == x1:
+                    break
+                else:
+                    x2 = min(max(x2, lo), hi)
+                f2 = evaluate(x2) - condition
+                if bracket:
+                    if np.sign(f2) == np.sign(fa):
+                        a, fa = x2, f2
+                    else:
+                        b, fb = x2, f2
+                x0, f0, x1, f1 = x1, f1, x2, f2
+            return GoalSeekResult(x1, f1 + condition, evaluations, bool(abs(f1) <= tol))
+
+        if method == 'newton':
+            name = target_row if isinstance(target_row, str) else next(name for name, candidate in self.get_rows().items() if candidate is row)
+
+            def derivative():
+                nonlocal evaluations
+                # One batched evaluation of the point and its two perturbations
+                evaluations += 3
+                return self.sensitivities([name], [input_field]).derivatives[input_field][name][t]
+
+            # Chord steps: the derivative is only computed again when a step does not halve the error
+            x = (lo + hi)/2
+            f = evaluate(x) - condition
+            slope = derivative()
+            for _ in range(max_iter):
+                if abs(f) <= tol:
+                    return GoalSeekResult(x, f + condition, evaluations, True)
+                if slope == 0:
+                    break
+                x_next = min(max(x - f/slope, lo), hi)
+                if x_next == x:
+                    break
+                f_next = evaluate(x_next) - condition
+                if abs(f_next) > abs(f)/2:
+                    slope = derivative()
+                x, f = x_next, f_next
+            return GoalSeekResult(x, f + condition, evaluations, bool(abs(f) <= tol))
+
+        raise ValueError(f"Unknown goal seek method: {method}")
+
+    def sensitivities(self, rows:list[str]|None = None, fields:list[str]|None = None, step:float = 1e-5) -> Sensitivities:
+        """``d(row, t)/d(field)`` for every named row (or ``rows``) and every numeric input field (or ``fields``),
+        from a single evaluation.
+
+        Instead of rebuilding the model twice per input, the model is built once in batch mode with the
+        base inputs plus an up and a down perturbation column per field (relative ``step``) and the
+        derivatives are the central differences between columns. ``discrete_inputs`` (years) are skipped
+        unless listed in ``fields``: the model is not differentiable in them.
+        """
+        if self.scenarios is not None:
+            raise ValueError("Sensitivities are computed around a single scenario")
+        inputs = self.inputs
+        if fields is None:
+            fields = [field.name for field in dataclasses.fields(inputs) if field.name not in self.discrete_inputs
+                      and isinstance(getattr(inputs, field.name), (int, float)) and not isinstance(getattr(inputs, field.name), bool)]
+        steps = {field: step*max(abs(getattr(inputs, field)), 1) for field in fields}
+        variants = [inputs]
+        for field in fields:
+            value = getattr(inputs, field)
+            variants += [dataclasses.replace(inputs, **{field: value + steps[field]}),
+                         dataclasses.replace(inputs, **{field: value - steps[field]})]
+
+        stacked, scenarios = stack_inputs(variants)
+        with self.variant(stacked) as model:
+            model.scenarios, model.result_cache = scenarios, None
+            model.build()
+            arrays = model.arrays()
+        rows = list(rows) if rows is not None else list(arrays)
+        derivatives = {field: {row: (arrays[row][2*i + 1] - arrays[row][2*i + 2])/(2*steps[field]) for row in rows}
+                       for i, field in enumerate(fields)}
+        return Sensitivities(self.period_labels(),
+                             {row: arrays[row][0] for row in rows}, derivatives, steps)
+
+    def evaluated(self) -> tuple[list[str], np.ndarray]:
+        """Names of the rows and their values ``(rows, periods[, scenarios])``. With a ``result_cache`` hits
+        are returned memory-mapped without evaluating, misses are evaluated and stored."""
+        names = list(self.get_rows())
+        if self.result_cache is not None and self.plan is None:
+            values = self.result_cache.load(self, names)
+            if values is not None:
+                return names, values
+        # Only values evaluated by this call are stored, not those of a plan already up to date
+        plan = self.plan
+        fresh = (plan is None or plan.periods != self.periods or plan.scenarios != self.scenarios
+                 or bool(plan.dirty) or min(plan.filled, default=0) < plan.periods)
+        plan = self.evaluate()
+        values = plan.values[[plan.slots[name] for name in names]]
+        if self.result_cache is not None and fresh:
+            self.result_cache.store(self, names, values)
+        return names, values
+
+    def profile(self):
+        """Evaluate on an instrumented plan and return a ``models.profiling.Profile`` with evaluation counts,
+        cumulative/self time, hits/misses and depth per row, plus the dependency graph (``to_dot``/``to_json``).
+        Instrumentation lives in that plan only, normal evaluations are not affected."""
+        from models.profiling import profile
+        return profile(self)
+
+    def result(self, lazy:bool = False) -> ModelResult:
+        """Every named row evaluated, as a ``ModelResult``. ``lazy=True`` uses the recursive per-row cache instead
+        of the compiled plan (debugging)."""
         rows = self.get_rows()
-        rows_data = [RowData(name, row) for name, row in rows.items()]
-        for row in rows_data:
-            row.calculate_values(self.periods)
+        if lazy:
+            names = list(rows)
+            values = np.array([list(row.values.values()) for row in self.get_data(lazy=True)], dtype=float)
+        else:
+            names, values = self.evaluated()
+        return ModelResult(names, [rows[name].group or "" for name in names], [rows[name].format for name in names],
+                           self.period_labels(), values)
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        """Values of every named row: ``(periods,)`` arrays, or ``(scenarios, periods)`` for batched models."""
+        result = self.result()
+        return {name: result.row(name).T for name in result.names}
+
+    def get_data(self, lazy:bool = False) -> list[RowData]:
+        """Evaluate every row. ``lazy=True`` uses the recursive per-row cache instead of the compiled plan (debugging)."""
+        rows = self.get_rows()
+        rows_data = [RowData(name, row, index) for index, (name, row) in enumerate(rows.items())]
+        if lazy:
+            if self.plan is not None:
+                self.plan.detach()
+            for row in rows_data:
+                row.calculate_values(self.periods)
+            return rows_data
+
+        names, values = self.evaluated()
+        for row, row_values in zip(rows_data, values):
+            row.values = period_values(row_values, row.row.format)
 
         return rows_data
     
-    def df(self):
-        rows_data = self.get_data()
-        df_data = []
-        category_label = "Categoria"
-        name_label = "Concepto"
-
-        for row in rows_data:
-            category = row.row.group if row.row.group is not None else ""
-            _data = {name_label:row.name, category_label:category}
-            for t, value in row.values.items():
-                _data[str(t + self.initial_period)] = value
-            df_data.append(_data)
-
-        df = pd.DataFrame(df_data)
-        df = df.set_index([category_label, name_label])
-        #df = df.sort_index()
-        df.columns = df.columns.astype(int)
-        
-        return df
+    def df(self, lazy:bool = False) -> "pd.DataFrame":
+        """Every row by (``Categoria``, ``Concepto``) and period, a float64 view of ``result()`` (booleans as 1/0)."""
+        if self.scenarios is not None:
+            raise ValueError("df() needs a single scenario, use result() or arrays() on batched models")
+        return self.result(lazy).to_pandas()
     
-    def show(self):
+    def table(self, titles:list|None = None) -> Table:
+        result = self.result()
+        return Table(TableStyle(self.get_rows()), result.values, result.periods, titles)
+
+    def show(self, titles:list|None = None) -> Table:
+        """Table of every row. Batched models show one table per scenario (labelled by ``titles``)."""
+        return self.table(titles)
+
+    def styler(self):
+        """The table as a pandas Styler, for further styling. ``show`` renders the same look much faster."""
+        import pandas as pd
         df = self.df()
         rows = self.get_rows()
 
@@ -207,7 +1731,7 @@ class Model():
             if row.name[1] in rows_to_highlight:
                 idx_rows_to_highlight.append(i)
 
-        def apply_row_styles(row:pd.Series):
+        def apply_row_styles(row:"pd.Series"):
             # Get the integer position of the row
             idx = df.index.get_loc(row.name)
             # Check for Highlight
@@ -286,20 +1810,10 @@ class Model():
 
         return df_style
     
-    def to_html(self, filepath:str):
-        styled = self.show()
-        styled.set_table_styles([
-            {
-                'selector': 'th, td', 
-                'props': [('font-family', 'Verdana, Geneva, sans-serif'), ('font-size', '8px'), ('border', 'none'), ('padding', '2px')]
-            },
-            {
-                'selector': '', # Targets the <table> tag itself
-                'props': [('border-collapse', 'collapse'), ('border', 'none'), ('padding', '0px')]
-            },
-        ], overwrite=False)
-        html = styled.to_html(filepath)
-        return html
+    def to_html(self, filepath=None, titles:list|None = None) -> str|None:
+        """Write the table to ``filepath`` (path or text stream), or return the HTML if it is ``None``.
+        Batched models write one table per scenario into the same report, sharing the style metadata."""
+        return self.table(titles).to_html(filepath, compact=True)
     
 
 
@@ -0,0 +1,208 @@
+import copy
+import os
+import numpy as np
+import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from models.model import Model, FormulaRow, Formats
+
+
+class Normal:
+    def __init__(self, mean:float, std:float):
+        self.mean = mean
+        self.std = std
+
+    def sample(self, rng:np.random.Generator, size) -> np.ndarray:
+        return rng.normal(self.mean, self.std, size)
+
+
+class LogNormal:
+    """Rate ``r`` with ``1 + r`` lognormal, parametrised by the mean and standard deviation of ``r``."""
+    def __init__(self, mean:float, std:float):
+        self.mean = mean
+        self.std = std
+
+    def sample(self, rng:np.random.Generator, size) -> np.ndarray:
+        sigma2 = np.log(1 + (self.std/(1 + self.mean))**2)
+        mu = np.log(1 + self.mean) - sigma2/2
+        return np.exp(rng.normal(mu, np.sqrt(sigma2), size)) - 1
+
+
+class Bootstrap:
+    """Resamples a historical series. ``block > 1`` draws consecutive runs of ``block`` values
+    (moving block bootstrap) to keep the autocorrelation of the series."""
+    def __init__(self, series, block:int = 1):
+        self.series = np.asarray([value for value in series if value is not None and not np.isnan(value)], dtype=float)
+        self.block = block
+        if len(self.series) < block:
+            raise ValueError("The series is shorter than the bootstrap block")
+
+    def sample(self, rng:np.random.Generator, size) -> np.ndarray:
+        size = (size,) if np.isscalar(size) else tuple(size)
+        if self.block == 1:
+            return rng.choice(self.series, size)
+        periods, rest = size[0], size[1:]
+        blocks = -(-periods // self.block)
+        starts = rng.integers(0, len(self.series) - self.block + 1, (blocks,) + rest)
+        offsets = np.arange(self.block).reshape((1, self.block) + (1,)*len(rest))
+        index = (starts[:, None] + offsets).reshape((blocks*self.block,) + rest)[:periods]
+        return self.series[index]
+
+
+class StochasticRow(FormulaRow):
+    """Row with an independent draw from ``distribution`` per path (scenario) and period.
+
+    Under a compiled plan the whole ``(periods, paths)`` matrix is drawn at once from ``seed``,
+    so results only depend on the seed. The lazy path draws each period on its own.
+    """
+    __slots__ = ('distribution', 'seed', 'draws')
+
+    def __init__(self, distribution, seed=None, group:str = None, highlight:bool = False, format:str = Formats.default):
+        super().__init__(lambda row, t: row.draw(t), group=group, highlight=highlight, format=format)
+        self.distribution = distribution
+        self.seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.draws: np.ndarray|None = None
+
+    def reseed(self, seed):
+        self.seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.draws = None
+        self.clear()
+        if self._plan is not None:
+            self._plan.invalidate([self._slot])
+
+    def draw(self, t:int):
+        plan = self._plan
+        if plan is None:
+            seed = np.random.SeedSequence(self.seed.entropy, spawn_key=self.seed.spawn_key + (t,))
+            return float(self.distribution.sample(np.random.default_rng(seed), None))
+        shape = (plan.periods,) if plan.scenarios is None else (plan.periods, plan.scenarios)
+        if self.draws is None or self.draws.shape != shape:
+            self.draws = self.distribution.sample(np.random.default_rng(self.seed), shape)
+        return self.draws[t]
+
+
+class QuantileSketch:
+    """Mergeable per-period quantile summary of many paths, kept to at most ``size`` weighted points
+    per period so memory does not grow with the number of paths."""
+    def __init__(self, values:np.ndarray, weights:np.ndarray, size:int = 1000):
+        self.size = size
+        self.values, self.weights = self._compress(values, weights)
+
+    @classmethod
+    def from_paths(cls, paths:np.ndarray, size:int = 1000) -> "QuantileSketch":
+        # paths: (paths, periods)
+        values = np.ascontiguousarray(paths.T, dtype=float)
+        return cls(values, np.ones_like(values), size)
+
+    def merge(self, other:"QuantileSketch") -> "QuantileSketch":
+        return QuantileSketch(np.concatenate([self.values, other.values], axis=1),
+                              np.concatenate([self.weights, other.weights], axis=1), self.size)
+
+    def _compress(self, values:np.ndarray, weights:np.ndarray):
+        order = np.argsort(values, axis=1)
+        values = np.take_along_axis(values, order, axis=1)
+        weights = np.take_along_axis(weights, order, axis=1)
+        if values.shape[1] <= self.size:
+            return values, weights
+        total = weights.sum(axis=1)
+        levels = (np.arange(self.size) + 0.5)/self.size
+        compressed = np.array([self._interpolate(levels*total[p], values[p], weights[p]) for p in range(len(values))])
+        return compressed, np.repeat((total/self.size)[:, None], self.size, axis=1)
+
+    @staticmethod
+    def _interpolate(targets, values, weights):
+        return np.interp(targets, np.cumsum(weights) - weights/2, values)
+
+    def quantile(self, q:float) -> np.ndarray:
+        total = self.weights.sum(axis=1)
+        return np.array([self._interpolate(q*total[p], self.values[p], self.weights[p]) for p in range(len(self.values))])
+
+
+@dataclass
+class MonteCarloResult:
+    paths: int
+    periods: list[int]
+    percentiles: dict[str, dict[float, np.ndarray]]
+    mean: dict[str, np.ndarray]
+    probability_ever_false: dict[str, float]
+
+    def df(self) -> pd.DataFrame:
+        columns = {}
+        for row, bands in self.percentiles.items():
+            columns.update({(row, f"p{p:g}"): values for p, values in bands.items()})
+            columns[(row, "mean")] = self.mean[row]
+        return pd.DataFrame(columns, index=self.periods)
+
+
+def _run_chunk(model_cls:type[Model], inputs, stochastic:dict, paths:int, seed:np.random.SeedSequence,
+               rows:tuple[str, ...], ever_false:tuple[str, ...], sketch_size:int, kwargs:dict):
+    model = model_cls(copy.deepcopy(inputs), **kwargs)
+    model.scenarios = paths
+    for (name, distribution), row_seed in zip(sorted(stochastic.items()), seed.spawn(len(stochastic))):
+        model.override(name, StochasticRow(distribution, row_seed))
+    model.build()
+    arrays = model.arrays()
+    sketches = {row: QuantileSketch.from_paths(arrays[row], sketch_size) for row in rows}
+    sums = {row: arrays[row].sum(axis=0) for row in rows}
+    failures = {row: int(np.sum(~np.all(arrays[row] != 0, axis=1))) for row in ever_false}
+    model.dispose()
+    return paths, sketches, sums, failures
+
+
+def monte_carlo(model_cls:type[Model], inputs, stochastic:dict, paths:int = 10_000, chunk_size:int = 2_000,
+                seed:int|None = None, rows:tuple[str, ...] = ('patrimonio_real', 'fondos_real'),
+                ever_false:tuple[str, ...] = ('fondos_disponibles',), percentiles:tuple[float, ...] = (5, 50, 95),
+                workers:int|None = None, sketch_size:int = 1000, **kwargs) -> MonteCarloResult:
+    """Evaluate ``paths`` stochastic paths of ``model_cls(inputs, **kwargs)`` (``kwargs`` such as the granularity
+    go to every model).
+
+    ``stochastic`` maps row names to distributions (``Normal``, ``LogNormal``, ``Bootstrap``); those rows
+    become ``StochasticRow``s. Paths are evaluated in batched chunks of ``chunk_size`` across a process
+    pool (``workers=1`` runs inline) and every chunk is reduced to quantile sketches, sums and failure
+    counts before it is merged, so memory is bounded by the chunk size, not the number of paths.
+    Results only depend on ``seed`` and ``chunk_size``, not on the number of workers.
+    """
+    sizes = [min(chunk_size, paths - start) for start in range(0, paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(model_cls, inputs, stochastic, size, chunk_seed, tuple(rows), tuple(ever_false), sketch_size, kwargs)
+            for size, chunk_seed in zip(sizes, seeds)]
+
+    sketches: dict[str, QuantileSketch] = {}
+    sums = {row: 0 for row in rows}
+    failures = {row: 0 for row in ever_false}
+    done = 0
+
+    def reduce(result):
+        nonlocal done
+        count, chunk_sketches, chunk_sums, chunk_failures = result
+        done += count
+        for row in rows:
+            sketches[row] = sketches[row].merge(chunk_sketches[row]) if row in sketches else chunk_sketches[row]
+            sums[row] = sums[row] + chunk_sums[row]
+        for row in ever_false:
+            failures[row] += chunk_failures[row]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) == 1:
+        for job in jobs:
+            reduce(_run_chunk(*job))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Only a few chunks in flight at a time so pending results do not pile up
+            pending = deque()
+            for job in jobs:
+                pending.append(executor.submit(_run_chunk, *job))
+                if len(pending) >= 2*workers:
+                    reduce(pending.popleft().result())
+            while pending:
+                reduce(pending.popleft().result())
+
+    model = model_cls(inputs, **kwargs)
+    return MonteCarloResult(
+        paths=done,
+        periods=model.period_labels(),
+        percentiles={row: {p: sketches[row].quantile(p/100) for p in percentiles} for row in rows},
+        mean={row: sums[row]/done for row in rows},
+        probability_ever_false={row: failures[row]/done for row in ever_false},
+    )
@@ -0,0 +1,160 @@
+import dataclasses
+import itertools
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Callable
+from models.model import Model
+
+
+def pareto_front(objectives:np.ndarray) -> np.ndarray:
+    """Mask of the points (rows of ``objectives``, larger is better in every column) no other point dominates."""
+    front = np.ones(len(objectives), dtype=bool)
+    for i, point in enumerate(objectives):
+        if front[i]:
+            # Whatever i dominates is dominated by whatever dominates i, so only front points are compared
+            front[np.all(objectives <= point, axis=1) & np.any(objectives < point, axis=1)] = False
+    return front
+
+
+@dataclass
+class SearchResult:
+    """Every point ``pareto_search`` evaluated: ``points[field]`` and ``objectives[name]`` arrays, the ``feasible``
+    mask and the ``pareto`` mask (non-dominated feasible points), and the refinement ``level`` of each point."""
+    points: dict[str, np.ndarray]
+    objectives: dict[str, np.ndarray]
+    feasible: np.ndarray
+    pareto: np.ndarray
+    level: np.ndarray
+    rounds: int
+
+    @property
+    def evaluations(self) -> int:
+        return len(self.feasible)
+
+    def df(self) -> pd.DataFrame:
+        columns = {**self.points, **{name: values for name, values in self.objectives.items() if name not in self.points}}
+        return pd.DataFrame({**columns, 'feasible': self.feasible, 'pareto': self.pareto, 'level': self.level})
+
+    def frontier(self) -> pd.DataFrame:
+        """Pareto-optimal points, sorted by the first objective."""
+        return self.df()[self.pareto].sort_values(next(iter(self.objectives))).reset_index(drop=True)
+
+
+def _evaluate(model_cls:type[Model], inputs, points:dict[str, np.ndarray], objectives:list[str],
+              rules:list[str]|None, condition:Callable|None, t:int|None, kwargs:dict) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    scenarios = len(next(iter(points.values())))
+    with model_cls(dataclasses.replace(inputs, **points), **kwargs) as model:
+        model.scenarios = scenarios
+        model.build()
+        t = model.periods - 1 if t is None else t
+        rows = [name for name in objectives if name not in points]
+        model.evaluate(rows, t)
+        values = {name: np.broadcast_to(points[name] if name in points else getattr(model, name)(t), scenarios).astype(float)
+                  for name in objectives}
+        feasible = np.broadcast_to(model.check(rules, short_circuit=False).feasible, scenarios).copy()
+        if condition is not None:
+            feasible &= np.asarray(condition(model), dtype=bool)
+    return feasible, values
+
+
+def pareto_search(model_cls:type[Model], inputs, space:dict[str, tuple], objectives:dict[str, str],
+                  condition:Callable[[Model], np.ndarray]|None = None, rules:list[str]|None = None, t:int|None = None,
+                  levels:int = 5, max_level:int = 6, budget:int = 2_000, chunk_size:int = 2_000, **kwargs) -> SearchResult:
+    """Search the inputs in ``space`` (``{field: (low, high)}``, integer bounds search integers) for the feasible
+    points and the Pareto frontier of ``objectives`` (``{field or row: 'min' or 'max'}``, rows read at period ``t``,
+    the last one by default).
+
+    A point is feasible if the model's ``rules`` pass (every declared rule by default, see ``Model.check``) and
+    ``condition(model)`` holds, one value per scenario of the batched model (``model.patrimonio_real(t) > target``).
+
+    The search starts from a grid of ``levels`` values per field and then only subdivides the grid cells that
+    straddle the feasibility boundary or touch the current frontier, halving them every round, and skips the
+    cells where even the best corner value of every objective is dominated by the frontier. Integer fields
+    stop splitting once their spacing reaches 1. It stops when no cell needs refining, after
+    ``max_level`` rounds or once ``budget`` evaluations are spent. Each round is
+    evaluated as batched models of up to ``chunk_size`` scenarios, ``kwargs`` (the granularity...) go to every model.
+    """
+    fields = list(space)
+    integer = [all(isinstance(bound, (int, np.integer)) for bound in space[field]) for field in fields]
+    signs = np.array([{'max': 1, 'min': -1}[sense] for sense in objectives.values()])
+    if levels**len(fields) > budget:
+        raise ValueError(f"The initial grid ({levels}^{len(fields)} points) exceeds the budget of {budget} evaluations")
+
+    # Levels each field is split for: integer fields until their spacing reaches 1, so every integer is reachable
+    splits = [int(np.ceil(np.log2(max((high - low)/(levels - 1), 1)))) if is_integer else max_level
+              for (low, high), is_integer in zip(space.values(), integer)]
+
+    def value(level:int, lattice:tuple) -> tuple:
+        # Point ``lattice`` of the grid at refinement ``level``, whose spacing halves at every level
+        point = []
+        for (low, high), i, is_integer, split in zip(space.values(), lattice, integer, splits):
+            x = low + (high - low)*i/((levels - 1)*2**min(level, split))
+            point.append(int(round(x)) if is_integer else x)
+        return tuple(point)
+
+    keys: dict[tuple, int] = {}
+    found: list[tuple] = []
+    found_level: list[int] = []
+    feasible = np.zeros(0, dtype=bool)
+    values = np.zeros((0, len(objectives)))
+
+    def evaluate(points:list[tuple], level:int):
+        nonlocal feasible, values
+        for start in range(0, len(points), chunk_size):
+            chunk = points[start:start + chunk_size]
+            columns = {field: np.array([point[i] for point in chunk], dtype=int if integer[i] else float)
+                       for i, field in enumerate(fields)}
+            chunk_feasible, chunk_values = _evaluate(model_cls, inputs, columns, list(objectives), rules, condition, t, kwargs)
+            feasible = np.concatenate([feasible, chunk_feasible])
+            values = np.concatenate([values, np.column_stack([chunk_values[name] for name in objectives])])
+            for point in chunk:
+                keys[point] = len(found)
+                found.append(point)
+                found_level.append(level)
+
+    def frontier() -> np.ndarray:
+        front = np.zeros(len(found), dtype=bool)
+        candidates = np.flatnonzero(feasible)
+        front[candidates[pareto_front(values[candidates]*signs)]] = True
+        return front
+
+    level = 0
+    cells = list(itertools.product(range(levels - 1), repeat=len(fields)))
+    evaluate([value(0, lattice) for lattice in itertools.product(range(levels), repeat=len(fields))], 0)
+    corners = list(itertools.product((0, 1), repeat=len(fields)))
+    rounds = 0
+    while cells and level < max_level and len(found) < budget:
+        front = frontier()
+        best = values[front]*signs
+        # Cells touching the frontier or with feasible and infeasible corners, unless even the best value of
+        # every objective over their corners is dominated by the frontier: they cannot improve it
+        refine = []
+        for cell in cells:
+            indices = [keys[value(level, tuple(c + o for c, o in zip(cell, offset)))] for offset in corners]
+            if front[indices].any() or (feasible[indices].any() and not feasible[indices].all()):
+                ideal = (values[indices]*signs).max(axis=0)
+                if not np.any(np.all(best >= ideal, axis=1) & np.any(best > ideal, axis=1)):
+                    refine.append(cell)
+        pending: dict[tuple, None] = {}
+        children = []
+        for cell in refine:
+            halves = [((2*c, 2*c + 1), (2*c, 2*c + 1, 2*c + 2)) if level < split else ((c,), (c, c + 1))
+                      for c, split in zip(cell, splits)]
+            refined = list(itertools.product(*[starts for starts, _ in halves]))
+            missing = [point for point in (value(level + 1, lattice) for lattice in itertools.product(*[points for _, points in halves]))
+                       if point not in keys and point not in pending]
+            if len(found) + len(pending) + len(missing) > budget:
+                break
+            pending.update(dict.fromkeys(missing))
+            children += refined
+        if not pending:
+            break
+        evaluate(list(pending), level + 1)
+        cells = children
+        level += 1
+        rounds += 1
+
+    points = {field: np.array([point[i] for point in found], dtype=int if integer[i] else float) for i, field in enumerate(fields)}
+    return SearchResult(points, {name: values[:, i] for i, name in enumerate(objectives)}, feasible, frontier(),
+                        np.array(found_level), rounds)
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from models.model import Model, stack_inputs
+from models.spec import ModelSpec, SpecModel
+
+
+def make_model(definition:type[Model]|ModelSpec, inputs, **kwargs) -> Model:
+    """A model from a picklable definition: a ``Model`` subclass taking the inputs, or a ``ModelSpec``.
+    ``kwargs`` go to the model (``granularity``...)."""
+    if isinstance(definition, ModelSpec):
+        return SpecModel(definition, inputs, **kwargs)
+    return definition(inputs, **kwargs)
+
+
+def shared_directory() -> str:
+    # RAM-backed where available (Linux), so the mapped file never has to reach the disk
+    return '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+
+def _run_chunk(definition, inputs:list, rows:list[str], path:str, shape:tuple[int, int, int], start:int, kwargs:dict) -> int:
+    output = np.memmap(path, dtype=float, mode='r+', shape=shape)
+    stacked, scenarios = stack_inputs(inputs)
+    with make_model(definition, stacked, **kwargs) as model:
+        model.scenarios = scenarios
+        model.build()
+        arrays = model.arrays()
+        for i, row in enumerate(rows):
+            output[i, start:start + scenarios] = arrays[row]
+    output.flush()
+    del output
+    return scenarios
+
+
+class SharedResult:
+    """Values of ``rows`` for every scenario, ``arrays[row]`` of shape ``(scenarios, periods)``, backed by one
+    memory-mapped block the workers wrote into. ``close()`` (or leaving a ``with`` block) releases it, so
+    copy what has to outlive it."""
+    def __init__(self, path:str, rows:list[str], periods:list[int], shape:tuple[int, int, int]):
+        self.path = path
+        self.rows = rows
+        self.periods = periods
+        self.values = np.memmap(path, dtype=float, mode='w+', shape=shape)
+        self.arrays = {row: self.values[i] for i, row in enumerate(rows)}
+
+    def close(self):
+        if self.path is None:
+            return
+        self.arrays = {}
+        self.values = None
+        os.unlink(self.path)
+        self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_parallel(definition:type[Model]|ModelSpec, inputs:list, rows:list[str]|None = None,
+                 chunk_size:int = 1_000, workers:int|None = None, **kwargs) -> SharedResult:
+    """Evaluate ``definition`` for every inputs set in ``inputs`` across a process pool.
+
+    Workers only receive the definition (a ``Model`` subclass or a ``ModelSpec``) and their chunk of
+    inputs, rebuild the model in batch mode and write ``rows`` (every named row by default) straight
+    into a memory-mapped block shared with the parent, so no model or DataFrame is pickled back.
+    ``workers=1`` runs inline. ``kwargs`` go to every model (``granularity=Granularity.month``).
+    """
+    inputs = list(inputs)
+    probe = make_model(definition, inputs[0], **kwargs)
+    periods = probe.period_labels()
+    if rows is None:
+        probe.build()
+        rows = list(probe.get_rows())
+        probe.dispose()
+    shape = (len(rows), len(inputs), len(periods))
+    descriptor, path = tempfile.mkstemp(dir=shared_directory(), suffix='.results')
+    os.close(descriptor)
+    result = SharedResult(path, list(rows), periods, shape)
+    jobs = [(definition, inputs[start:start + chunk_size], result.rows, path, shape, start, kwargs)
+            for start in range(0, len(inputs), chunk_size)]
+    try:
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(jobs) == 1:
+            for job in jobs:
+                _run_chunk(*job)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for future in [executor.submit(_run_chunk, *job) for job in jobs]:
+                    future.result()
+    except BaseException:
+        result.close()
+        raise
+    return result
@@ -0,0 +1,193 @@
+import json
+import time
+import pandas as pd
+from dataclasses import dataclass, asdict
+from models.model import Model, EvaluationPlan, FormulaRow, ExpressionRow, RecurrenceRow, referenced_rows
+
+
+@dataclass
+class RowStats:
+    evaluations: int = 0    # formula calls (one per period) and vector operations (one per period range)
+    cumulative: float = 0.0 # seconds, including the rows computed on demand from inside the formula
+    self_time: float = 0.0
+    hits: int = 0           # reads served from the plan's value array
+    misses: int = 0         # reads that had to compute the value on demand (or fall back to the lazy path)
+    max_depth: int = 0      # deepest nesting of on-demand computations reached while evaluating the row
+
+    def add(self, other:"RowStats"):
+        self.evaluations += other.evaluations
+        self.cumulative += other.cumulative
+        self.self_time += other.self_time
+        self.hits += other.hits
+        self.misses += other.misses
+        self.max_depth = max(self.max_depth, other.max_depth)
+
+
+_counting_classes: dict[type, type] = {}
+
+def counting_class(cls:type) -> type:
+    """Subclass of row class ``cls`` whose reads are counted as hits/misses. Rows are switched to it only
+    while a ``ProfiledPlan`` is attached, so the normal ``FormulaRow.__call__`` carries no profiling code."""
+    if cls not in _counting_classes:
+        def __call__(self, t):
+            plan = self._plan
+            if plan is None:
+                return self.lazy(t)
+            stats = plan.stats[self._slot]
+            filled = plan._done if plan._tracing else plan.filled
+            try:
+                if 0 <= t < filled[self._slot]:
+                    stats.hits += 1
+                    # While tracing, lookup records the read as a dependency
+                    return plan.lookup(self, t) if plan._tracing else plan.values[self._slot, t]
+            except ValueError:
+                stats.hits += 1
+                return plan.read(self, t)
+            stats.misses += 1
+            return plan.lookup(self, t)
+        _counting_classes[cls] = type(cls.__name__, (cls,), {'__slots__': (), '__call__': __call__, '__module__': cls.__module__})
+    return _counting_classes[cls]
+
+
+class ProfiledPlan(EvaluationPlan):
+    """``EvaluationPlan`` that records ``RowStats`` per slot."""
+    def __init__(self, model:Model):
+        super().__init__(model)
+        self.stats = [RowStats() for _ in self.rows]
+        self._children = []     # time spent in nested computations, one accumulator per open computation
+
+    def attach(self):
+        super().attach()
+        for row in self.rows + self.aliases:
+            if type(row) not in _counting_classes.values():
+                row.__class__ = counting_class(type(row))
+
+    def detach(self):
+        super().detach()
+        for row in self.rows + self.aliases:
+            if type(row) in _counting_classes.values():
+                row.__class__ = type(row).__bases__[0]
+
+    def _timed(self, slot:int, compute):
+        stats = self.stats[slot]
+        self._children.append(0.0)
+        stats.max_depth = max(stats.max_depth, len(self._children))
+        start = time.perf_counter()
+        try:
+            return compute()
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._children.pop()
+            stats.evaluations += 1
+            stats.cumulative += elapsed
+            stats.self_time += elapsed - children
+            if self._children:
+                self._children[-1] += elapsed
+
+    def _compute(self, row:FormulaRow, t:int):
+        return self._timed(row._slot, lambda: super(ProfiledPlan, self)._compute(row, t))
+
+    def _step(self, slots:list[int], start:int, stop:int):
+        for t in range(start, stop):
+            self.t = t
+            for slot in slots:
+                if self.filled[slot] <= t:
+                    self._compute(self.rows[slot], t)
+
+    def _vector_row(self, row:FormulaRow, start:int, stop:int) -> bool:
+        return self._timed(row._slot, lambda: super(ProfiledPlan, self)._vector_row(row, start, stop))
+
+    def _vector(self, row:ExpressionRow, start:int, stop:int):
+        return self._timed(row._slot, lambda: super(ProfiledPlan, self)._vector(row, start, stop))
+
+    def _recurrence(self, row:RecurrenceRow, start:int, stop:int):
+        return self._timed(row._slot, lambda: super(ProfiledPlan, self)._recurrence(row, start, stop))
+
+
+class Profile:
+    """Result of ``Model.profile``: ``RowStats`` per evaluated row and the dependency graph.
+
+    Anonymous rows (operator results, helper rows) are attributed to the first named row, in
+    definition order, that reads them directly or through other anonymous rows.
+    """
+    def __init__(self, plan:ProfiledPlan, wall:float):
+        self.wall = wall
+        self.names = [name or f"<row {slot}>" for slot, name in enumerate(plan.names)]
+        self.slots = list(range(len(plan.rows)))
+        self.stats = plan.stats
+        self.owners = self._owners(plan)
+        self.edges = sorted((dependency, reader, lag) for dependency, readers in enumerate(plan.readers())
+                            for reader, lag in readers)
+
+    @staticmethod
+    def _owners(plan:EvaluationPlan) -> list[int]:
+        owners = [slot if name is not None else None for slot, name in enumerate(plan.names)]
+        for slot, name in enumerate(plan.names):
+            if name is None:
+                continue
+            pending = [plan.rows[slot]]
+            while pending:
+                for dependency in referenced_rows(pending.pop()):
+                    position = plan.positions[id(dependency)]
+                    if owners[position] is None:
+                        owners[position] = slot
+                        pending.append(dependency)
+        return [owner if owner is not None else slot for slot, owner in enumerate(owners)]
+
+    def rows(self) -> dict[str, RowStats]:
+        """Stats per named row, with the anonymous rows it owns added in."""
+        totals = {}
+        for slot, owner in enumerate(self.owners):
+            totals.setdefault(self.names[owner], RowStats()).add(self.stats[slot])
+        return totals
+
+    def df(self) -> pd.DataFrame:
+        df = pd.DataFrame.from_dict({name: asdict(stats) for name, stats in self.rows().items()}, orient='index')
+        return df.sort_values('self_time', ascending=False)
+
+    def to_json(self, filepath:str|None = None) -> str|None:
+        graph = {
+            'wall': self.wall,
+            'nodes': [{'slot': slot, 'name': self.names[slot], 'owner': self.names[self.owners[slot]], **asdict(self.stats[slot])}
+                      for slot in self.slots],
+            'edges': [{'source': dependency, 'target': reader, 'lag': lag} for dependency, reader, lag in self.edges],
+        }
+        if filepath is None:
+            return json.dumps(graph, indent=2)
+        with open(filepath, 'w') as stream:
+            json.dump(graph, stream, indent=2)
+
+    def to_dot(self, filepath:str|None = None) -> str|None:
+        """Graphviz graph: node width and colour grow with self time, edges read at ``t-1`` are dashed."""
+        longest = max((stats.self_time for stats in self.stats), default=0) or 1
+        lines = ["digraph model {", "  rankdir=LR;", '  node [shape=box, style=filled, fontname="Verdana"];']
+        for slot in self.slots:
+            stats = self.stats[slot]
+            share = stats.self_time/longest
+            label = f"{self.names[slot]}\\n{stats.evaluations} evals, {stats.self_time*1e3:.2f} ms self"
+            lines.append(f'  n{slot} [label="{label}", penwidth={1 + 4*share:.2f}, fillcolor="0.0 {share:.2f} 1.0"];')
+        for dependency, reader, lag in self.edges:
+            lines.append(f"  n{dependency} -> n{reader}" + (" [style=dashed];" if lag else ";"))
+        lines.append("}")
+        dot = "\n".join(lines)
+        if filepath is None:
+            return dot
+        with open(filepath, 'w') as stream:
+            stream.write(dot)
+
+
+def profile(model:Model) -> Profile:
+    """Compile and evaluate ``model`` on a ``ProfiledPlan``, leaving the model's own plan untouched."""
+    previous = model.plan
+    if previous is not None:
+        previous.detach()
+    plan = ProfiledPlan(model)
+    start = time.perf_counter()
+    try:
+        plan.compile()
+        wall = time.perf_counter() - start
+        return Profile(plan, wall)
+    finally:
+        plan.detach()
+        if previous is not None:
+            previous.attach()
@@ -0,0 +1,229 @@
+"""Local HTTP service evaluating ModeloVida for the Simulador Vida frontend.
+
+    python service.py [--host 127.0.0.1] [--port 8765] [--workers 2]
+
+``POST /evaluate`` takes an ``InputsModeloVida`` as JSON (missing optional fields take the dataclass
+defaults, fields the Python model does not have are ignored and listed back) and answers
+``{"periods": [...], "rows": [{"name", "values", "format", "highlight", "group"}], "ignored": [...]}``,
+the ``RowMetadata`` shape of ``lib/vidaModel.ts``, with ``null`` for values that are not finite. ``GET /metrics`` reports latency and throughput.
+
+Identical requests in flight share one evaluation, recent results are kept in an LRU cache keyed by
+the normalized inputs, and requests arriving together are evaluated as one batched model in a
+process pool, so the event loop only parses, routes and serializes.
+"""
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from models.model import Formats, parse_inputs, stack_inputs
+from models.vida import InputsModeloVida, ModeloVida
+
+
+def normalize(payload:dict) -> tuple[str, InputsModeloVida, list[str]]:
+    """Inputs from a request body, their cache key and the ignored fields. Values of the wrong type are a
+    ValueError (400), before they can reach a batch shared with other requests."""
+    if not isinstance(payload, dict):
+        raise ValueError("The body must be a JSON object of InputsModeloVida fields")
+    inputs, ignored = parse_inputs(InputsModeloVida, payload)
+    key = json.dumps(dataclasses.asdict(inputs), sort_keys=True)
+    return key, inputs, ignored
+
+
+def evaluate_batch(inputs:list[InputsModeloVida]) -> np.ndarray:
+    """Every named row for every inputs set, ``(scenarios, rows, periods)``. Runs in the worker pool."""
+    stacked, scenarios = stack_inputs(inputs)
+    with ModeloVida(stacked) as model:
+        model.scenarios = scenarios
+        model.build()
+        names, values = model.evaluated()
+        return np.ascontiguousarray(np.moveaxis(values, 2, 0))
+
+
+class Metrics:
+    def __init__(self, window:int = 10_000):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.evaluations = 0
+        self.batches = 0
+        self.latencies = deque(maxlen=window)
+
+    def report(self) -> dict:
+        uptime = time.perf_counter() - self.started
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        return {
+            'uptime_s': uptime,
+            'requests': self.requests,
+            'errors': self.errors,
+            'throughput_rps': self.requests/uptime if uptime else 0.0,
+            'cache_hits': self.cache_hits,
+            'coalesced': self.coalesced,
+            'evaluations': self.evaluations,
+            'batches': self.batches,
+            'mean_batch_size': self.evaluations/self.batches if self.batches else 0.0,
+            'latency_ms': {f"p{p}": float(np.percentile(latencies, p))*1e3 for p in (50, 95, 99)},
+        }
+
+
+class VidaService:
+    def __init__(self, workers:int = 2, cache_size:int = 4096, max_batch:int = 256, batch_window:float = 0.002):
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.cache: OrderedDict[str, bytes] = OrderedDict()
+        self.cache_size = cache_size
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.in_flight: dict[str, asyncio.Future] = {}
+        self.queue: asyncio.Queue|None = None
+        # Batches being evaluated: the event loop only keeps weak references to tasks
+        self.tasks: set[asyncio.Task] = set()
+        self.metrics = Metrics()
+
+        # Row metadata does not depend on the inputs, which are only read inside formulas
+        probe = ModeloVida(None)
+        probe.build()
+        self.periods = probe.period_labels()
+        self.rows = [{'name': name, 'group': row.group or "", 'highlight': bool(row.highlight),
+                      **({'format': row.format} if row.format != Formats.default else {})}
+                     for name, row in probe.get_rows().items()]
+        probe.dispose()
+
+    async def evaluate(self, payload:dict) -> bytes:
+        key, inputs, ignored = normalize(payload)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.metrics.cache_hits += 1
+            body = self.cache[key]
+        elif key in self.in_flight:
+            self.metrics.coalesced += 1
+            body = await asyncio.shield(self.in_flight[key])
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self.in_flight[key] = future
+            await self.queue.put((key, inputs, future))
+            try:
+                body = await asyncio.shield(future)
+            finally:
+                self.in_flight.pop(key, None)
+        if ignored:
+            body = body[:-1] + b', "ignored": ' + json.dumps(ignored).encode() + b'}'
+        return body
+
+    def encode(self, values:np.ndarray) -> bytes:
+        # JSON has no NaN or infinities (JSON.parse refuses them): values that are not finite are null
+        if not np.isfinite(values).all():
+            values = np.where(np.isfinite(values), values, None)
+        rows = [{**row, 'values': row_values.tolist()} for row, row_values in zip(self.rows, values)]
+        return json.dumps({'periods': self.periods, 'rows': rows}, allow_nan=False).encode()
+
+    async def batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.metrics.batches += 1
+            self.metrics.evaluations += len(batch)
+            # Evaluated in the pool while the next batch is being collected
+            task = asyncio.create_task(self.run_batch(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run_batch(self, batch:list):
+        try:
+            values = await asyncio.get_running_loop().run_in_executor(self.executor, evaluate_batch, [inputs for _, inputs, _ in batch])
+        except Exception as error:
+            if len(batch) > 1:
+                # One failing request must not fail the others batched with it: evaluate each on its own
+                await asyncio.gather(*(self.run_batch([item]) for item in batch))
+            else:
+                batch[0][2].set_exception(error)
+            return
+        for (key, _, future), scenario in zip(batch, values):
+            body = self.encode(scenario)
+            self.cache[key] = body
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            future.set_result(body)
+
+    async def handle(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+        try:
+            while True:
+                request = await reader.readline()
+                if not request:
+                    break
+                method, path, _ = request.decode('latin-1').split(' ', 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                status, response = await self.route(method, path, body)
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\nContent-Length: {len(response)}\r\n"
+                             f"Access-Control-Allow-Origin: *\r\n\r\n".encode() + response)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method:str, path:str, body:bytes) -> tuple[str, bytes]:
+        if method == 'GET' and path == '/metrics':
+            return "200 OK", json.dumps(self.metrics.report()).encode()
+        if method == 'GET' and path == '/health':
+            return "200 OK", b'{"status": "ok"}'
+        if method == 'POST' and path == '/evaluate':
+            start = time.perf_counter()
+            self.metrics.requests += 1
+            try:
+                response = await self.evaluate(json.loads(body))
+            except (ValueError, TypeError) as error:
+                self.metrics.errors += 1
+                return "400 Bad Request", json.dumps({'error': str(error)}).encode()
+            except Exception as error:
+                self.metrics.errors += 1
+                return "500 Internal Server Error", json.dumps({'error': repr(error)}).encode()
+            self.metrics.latencies.append(time.perf_counter() - start)
+            return "200 OK", response
+        return "404 Not Found", b'{"error": "not found"}'
+
+    async def serve(self, host:str = '127.0.0.1', port:int = 8765):
+        self.queue = asyncio.Queue()
+        batcher = asyncio.create_task(self.batcher())
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving ModeloVida on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.executor.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ModeloVida evaluation service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument('--cache-size', type=int, default=4096)
+    args = parser.parse_args(argv)
+    asyncio.run(VidaService(args.workers, args.cache_size).serve(args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+import dataclasses
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Callable
+from models.model import Model, FormulaRow, SimpleRow, InputRow, Formats, Granularity, where, maximum, minimum
+
+# Functions formulas can use by name. Registered by reference, so they must be importable (module level)
+# in the processes that rebuild the model.
+FUNCTIONS: dict[str, Callable] = {}
+
+def register(function:Callable|None = None, name:str|None = None):
+    """Make ``function(model, row, t)`` usable as ``RowSpec(function=name)``. Works as a decorator."""
+    def decorator(function):
+        FUNCTIONS[name or function.__name__] = function
+        return function
+    return decorator(function) if function is not None else decorator
+
+
+@dataclass
+class RowSpec:
+    """One row of a ``ModelSpec``, given by exactly one of:
+
+    - ``formula``: per-period Python expression of ``t`` and ``row`` (``"inflaccion_acumulada(t-1) + 1 if t > 0 else 0"``)
+    - ``expression``: whole-row expression combining earlier rows with operators (``"gastos_fijos*(1 + inflaccion_acumulada)"``)
+    - ``input``: an inputs field read as it is (``InputRow``)
+    - ``value``: a constant (``SimpleRow``)
+    - ``function``: the name of a ``register``-ed function ``(model, row, t)``
+
+    Formulas see every row by name, ``inputs``, ``period(t)``, ``where``/``maximum``/``minimum`` and ``np``.
+    """
+    name: str
+    formula: str|None = None
+    expression: str|None = None
+    input: str|None = None
+    value: float|None = None
+    function: str|None = None
+    initial: float|None = None
+    group: str|None = None
+    highlight: bool = False
+    format: str = Formats.default
+
+
+@dataclass
+class ModelSpec:
+    """Declarative, picklable and JSON-serializable definition of a model: rows are data, not closures,
+    so ``SpecModel(spec, inputs)`` can be rebuilt in any process."""
+    rows: list[RowSpec] = field(default_factory=list)
+    periods: int = 5
+    initial_period: int = 2025
+    group_label: str|None = None
+
+    def set_group(self, group_label:str|None):
+        self.group_label = group_label
+
+    def row(self, name:str, formula:str|None = None, **kwargs) -> RowSpec:
+        kwargs.setdefault('group', self.group_label)
+        spec = RowSpec(name, formula, **kwargs)
+        if sum(getattr(spec, kind) is not None for kind in ('formula', 'expression', 'input', 'value', 'function')) != 1:
+            raise ValueError(f"Row {name} needs exactly one of formula, expression, input, value or function")
+        self.rows.append(spec)
+        return spec
+
+    def to_dict(self) -> dict:
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def from_dict(cls, data:dict) -> "ModelSpec":
+        return cls(**{**data, 'rows': [RowSpec(**row) for row in data['rows']]})
+
+
+def function_formula(model:Model, function:Callable) -> Callable:
+    # The function stays in the formula's closure so dependency discovery sees the rows it reads
+    return lambda row, t: function(model, row, t)
+
+
+class SpecModel(Model):
+    """Model built from a ``ModelSpec``. Pickling it sends the spec and the inputs, the rows are rebuilt."""
+    def __init__(self, spec:ModelSpec, inputs, **kwargs):
+        super().__init__(**kwargs)
+        self.spec = spec
+        self.inputs = inputs
+        self.periods = spec.periods
+        self.initial_period = spec.initial_period
+
+    def __reduce__(self):
+        return rebuild, (self.spec, self.inputs, self.periods, self.initial_period, self.scenarios, bool(self.ordered_rows),
+                         self.granularity)
+
+    def build(self):
+        namespace = {'np': np, 'where': where, 'maximum': maximum, 'minimum': minimum,
+                     'inputs': self.inputs, 'period': self.period}
+        for spec in self.spec.rows:
+            if spec.group is None:
+                self.reset_group()
+            else:
+                self.set_group(spec.group)
+            options = {'highlight': spec.highlight, 'format': spec.format}
+            if spec.input is not None:
+                row = InputRow(self.inputs, spec.input, **options)
+            elif spec.value is not None:
+                row = SimpleRow(spec.value, **options)
+            elif spec.function is not None:
+                row = FormulaRow(function_formula(self, FUNCTIONS[spec.function]), initial=spec.initial, **options)
+            elif spec.formula is not None:
+                formula = eval(compile(f"lambda row, t: ({spec.formula})", f"<{spec.name}>", 'eval'), namespace)
+                row = FormulaRow(formula, initial=spec.initial, **options)
+            else:
+                row = eval(compile(spec.expression, f"<{spec.name}>", 'eval'), namespace)
+                row = row if isinstance(row, FormulaRow) else SimpleRow(row)
+                row.highlight, row.format = spec.highlight, spec.format
+            setattr(self, spec.name, row)
+            # Formulas look names up when called, so rows defined later are found too
+            namespace[spec.name] = getattr(self, spec.name)
+        self.reset_group()
+
+
+def rebuild(spec:ModelSpec, inputs, periods:int, initial_period:int, scenarios:int|None, built:bool,
+            granularity:str = Granularity.year) -> SpecModel:
+    model = SpecModel(spec, inputs, granularity=granularity)
+    model.periods, model.initial_period, model.scenarios = periods, initial_period, scenarios
+    if built:
+        model.build()
+    return model
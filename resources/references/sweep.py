@@ -0,0 +1,104 @@
+import dataclasses
+import glob
+import json
+import os
+import numpy as np
+import pandas as pd
+from models.cache import canonical, model_version
+from models.model import Model
+
+
+def grid_size(grid:dict) -> int:
+    return int(np.prod([len(values) for values in grid.values()], dtype=np.int64))
+
+
+def grid_inputs(inputs, grid:dict, start:int, stop:int):
+    """Inputs for points ``start:stop`` of the Cartesian product of ``grid`` (last field varies fastest):
+    every swept field becomes an array over those points, the other fields keep their value."""
+    index = np.unravel_index(np.arange(start, stop), [len(values) for values in grid.values()])
+    return dataclasses.replace(inputs, **{field: np.asarray(values)[i] for (field, values), i in zip(grid.items(), index)})
+
+
+def _write_chunk(path:str, columns:dict[str, np.ndarray], format:str):
+    temporary = path + '.tmp'
+    if format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.table(columns), temporary)
+    else:
+        with open(temporary, 'wb') as stream:
+            np.savez(stream, **columns)
+    # The chunk only exists once it is complete, which is what resuming relies on
+    os.replace(temporary, path)
+
+
+def sweep(model_cls:type[Model], inputs, grid:dict, directory:str, rows:tuple[str, ...] = ('patrimonio_real',),
+          periods:list[int]|None = None, chunk_size:int = 2_000, format:str|None = None, **kwargs) -> list[str]:
+    """Evaluate ``model_cls`` over the Cartesian product of ``grid`` (``{field: values}``, other fields
+    from ``inputs``, ``kwargs`` such as the granularity to every model) and stream ``rows`` at ``periods``
+    (period labels, all by default) to ``directory``.
+
+    Points are evaluated ``chunk_size`` at a time as one batched model and every chunk is written to
+    its own file (``format`` ``'parquet'`` when pyarrow is installed, else ``'npz'``) with one column per
+    swept field and one per ``{row}_{period}``, so memory does not grow with the grid. Running it again
+    on the same directory skips the chunks already written, and refuses to resume one started with other
+    inputs, grid or rows, or with a model whose source has changed since. Returns the chunk paths in grid order.
+    """
+    if format is None:
+        try:
+            import pyarrow
+            format = 'parquet'
+        except ImportError:
+            format = 'npz'
+    model = model_cls(inputs, **kwargs)
+    all_periods = model.period_labels()
+    periods = list(periods) if periods is not None else all_periods
+    positions = [all_periods.index(period) for period in periods]
+
+    grid = {field: np.asarray(values).tolist() for field, values in grid.items()}
+    total = grid_size(grid)
+    # Everything the chunks depend on, the model's source included (as in ResultCache keys)
+    manifest = {'model': f"{model_cls.__module__}.{model_cls.__qualname__}", 'version': model_version(model_cls),
+                'inputs': canonical(inputs), 'granularity': model.granularity, 'grid': grid, 'rows': list(rows),
+                'periods': periods, 'chunk_size': chunk_size, 'format': format, 'points': total}
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, 'sweep.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as stream:
+            written = json.load(stream)
+        changed = [key for key, value in json.loads(json.dumps(manifest, default=repr)).items() if written.get(key) != value]
+        if changed:
+            raise ValueError(f"{directory} holds a different sweep ({', '.join(changed)} changed), use another directory to start a new one")
+    else:
+        with open(manifest_path, 'w') as stream:
+            json.dump(manifest, stream, default=repr)
+
+    paths = []
+    for chunk, start in enumerate(range(0, total, chunk_size)):
+        stop = min(start + chunk_size, total)
+        path = os.path.join(directory, f"chunk-{chunk:06d}.{format}")
+        paths.append(path)
+        if os.path.exists(path):
+            continue
+        with model_cls(grid_inputs(inputs, grid, start, stop), **kwargs) as model:
+            model.scenarios = stop - start
+            model.build()
+            arrays = model.arrays()
+            columns = {field: np.broadcast_to(getattr(model.inputs, field), (stop - start,)) for field in grid}
+            for row in rows:
+                for period, t in zip(periods, positions):
+                    columns[f"{row}_{period}"] = np.ascontiguousarray(arrays[row][:, t])
+            _write_chunk(path, columns, format)
+    return paths
+
+
+def load_sweep(directory:str) -> pd.DataFrame:
+    """Every chunk written by ``sweep`` in ``directory`` as one DataFrame, in grid order."""
+    frames = []
+    for path in sorted(glob.glob(os.path.join(directory, 'chunk-*'))):
+        if path.endswith('.parquet'):
+            frames.append(pd.read_parquet(path))
+        elif path.endswith('.npz'):
+            with np.load(path) as data:
+                frames.append(pd.DataFrame({name: data[name] for name in data.files}))
+    return pd.concat(frames, ignore_index=True)
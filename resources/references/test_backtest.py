@@ -0,0 +1,40 @@
+import dataclasses
+import numpy as np
+import pandas as pd
+from models.backtest import backtest, load_history
+from models.model import Series
+from models.vida import ModeloVida
+from test_model import INPUTS
+
+YEARS = 10
+
+
+def single(inflaccion:np.ndarray, tir_inmobiliaria:np.ndarray) -> dict[str, np.ndarray]:
+    model = ModeloVida(dataclasses.replace(INPUTS, inflaccion=Series(inflaccion), tir_inmobiliaria=Series(tir_inmobiliaria)))
+    model.periods = YEARS
+    model.build()
+    return model.arrays()
+
+
+def test_windows():
+    years = np.arange(1990, 2010)
+    history = pd.DataFrame({'cpi': np.linspace(0.01, 0.05, len(years)), 'medianHouseNominalUsd': np.linspace(0.06, -0.02, len(years))},
+                           index=pd.Index(years, name='year'))
+    history.loc[1995, 'cpi'] = np.nan
+    result = backtest(ModeloVida, INPUTS, history, years=YEARS)
+    # Windows containing 1995 are left out
+    assert result.start_years.tolist() == list(range(1996, 2001))
+    assert len(result.periods) == YEARS
+    for i, start in enumerate(result.start_years):
+        window = history.loc[start:start + YEARS - 1]
+        expected = single(window['cpi'].to_numpy(), window['medianHouseNominalUsd'].to_numpy())
+        for row in ('fondos_real', 'patrimonio_real'):
+            assert np.allclose(result.values[row][i], expected[row], rtol=1e-9), (start, row)
+    summary = result.summary()
+    assert summary.loc['patrimonio_real', 'worst'] <= summary.loc['patrimonio_real', 'median'] <= summary.loc['patrimonio_real', 'best']
+
+
+def test_history():
+    history = load_history()
+    assert 'cpi' in history
+    assert history['cpi'].dropna().between(-0.5, 1).all()
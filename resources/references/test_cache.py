@@ -0,0 +1,53 @@
+import numpy as np
+from models.cache import ResultCache, model_version
+from models.vida import ModeloVida
+from test_model import INPUTS, build
+
+
+def cached(cache:ResultCache, **fields) -> ModeloVida:
+    model = build(**fields)
+    model.result_cache = cache
+    return model
+
+
+def test_hit(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    names, values = cached(cache).evaluated()
+    hit_names, hit = cached(cache).evaluated()
+    assert hit_names == names and isinstance(hit, np.memmap)
+    assert np.array_equal(hit, values)
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'stores': 1, 'evictions': 0}
+    assert not np.array_equal(cached(cache, capital_inicial=300).evaluated()[1], values)
+    assert cache.misses == 2
+
+
+def test_store_once(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    model = cached(cache)
+    model.evaluated()
+    written = [path.stat().st_mtime_ns for path in tmp_path.glob('*.npy')]
+    for _ in range(3):
+        model.evaluated()
+    assert cache.stores == 1
+    assert [path.stat().st_mtime_ns for path in tmp_path.glob('*.npy')] == written
+    # A changed input is a new entry
+    model.set_input('capital_inicial', 300)
+    assert np.array_equal(model.evaluated()[1], build(capital_inicial=300).evaluated()[1])
+    assert cache.stores == 2
+
+
+def test_evict(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1)
+    cached(cache).evaluated()
+    cached(cache, capital_inicial=300).evaluated()
+    assert cache.evictions == 2 and cache.size() == 0
+
+
+def test_version():
+    class Modelo(ModeloVida):
+        version = 1
+    class Editado(ModeloVida):
+        version = 2
+    Editado.__qualname__ = Modelo.__qualname__
+    assert model_version(Modelo) != model_version(Editado)
+    assert model_version(ModeloVida) == model_version(ModeloVida)
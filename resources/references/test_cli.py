@@ -0,0 +1,48 @@
+import csv
+import dataclasses
+import json
+import numpy as np
+import pytest
+from models.cli import main
+from test_model import INPUTS, build
+
+
+def write_json(path, records):
+    path.write_text('\n'.join(json.dumps(record) for record in records))
+    return str(path)
+
+
+def test_jsonl(tmp_path, capsys):
+    records = [dataclasses.asdict(INPUTS), {**dataclasses.asdict(INPUTS), 'capital_inicial': 300}]
+    main([write_json(tmp_path / 'inputs.jsonl', records), '--rows', 'patrimonio_real', '--chunk-size', '1'])
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line['record'] for line in lines] == [0, 1]
+    assert np.allclose(lines[1]['patrimonio_real'], build(capital_inicial=300).result()['patrimonio_real'], rtol=1e-9)
+
+
+def test_csv_period(tmp_path, capsys):
+    path = tmp_path / 'inputs.csv'
+    fields = dataclasses.asdict(dataclasses.replace(INPUTS, descuentos_educacion=False))
+    with open(path, 'w', newline='') as stream:
+        writer = csv.DictWriter(stream, list(fields))
+        writer.writeheader()
+        writer.writerow({**fields, 'nacimiento_hijos': json.dumps(fields['nacimiento_hijos']), 'descuentos_educacion': 'FALSE'})
+    main([str(path), '--rows', 'fondos_real', '--t', '30'])
+    line, = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert np.isclose(line['fondos_real'], build(descuentos_educacion=False).fondos_real(30), rtol=1e-9)
+
+
+def test_bad_period(tmp_path, capsys):
+    path = write_json(tmp_path / 'inputs.json', [dataclasses.asdict(INPUTS)])
+    for t in ['60', '-1']:
+        with pytest.raises(SystemExit):
+            main([path, '--t', t])
+        assert '--t must be a period index from 0 to 59' in capsys.readouterr().err
+    main([path, '--t', '700', '--granularity', 'month'])
+    assert json.loads(capsys.readouterr().out)['record'] == 0
+
+
+def test_bad_record(tmp_path):
+    path = write_json(tmp_path / 'inputs.jsonl', [dataclasses.asdict(INPUTS), {**dataclasses.asdict(INPUTS), 'inflaccion': 'alta'}])
+    with pytest.raises(ValueError, match='Record 1: inflaccion'):
+        main([path])
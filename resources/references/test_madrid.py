@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+from models.madrid import SIN_COMPRA, break_even, load_precios, rent_vs_buy
+from test_model import INPUTS, build
+
+
+def test_break_even():
+    compra = np.array([[0, 2, 1, 3], [0, 0, 0, 0], [5, 5, 5, 5]])
+    alquiler = np.array([[1, 1, 2, 2], [1, 1, 1, 1], [1, 1, 1, 1]])
+    assert break_even(compra, alquiler).tolist() == [3, -1, 0]
+
+
+def test_rent_vs_buy():
+    precios = pd.DataFrame({'uri': ['a', 'b'], 'id': [1, 2], 'municipio': ['A', 'B'], 'nivel': 'municipio',
+                            'precio_venta_eur_m2': [2000.0, 6000.0], 'precio_alquiler_eur_m2_mes': [10.0, 20.0],
+                            'precios_estimados': False}).set_index('uri')
+    result = rent_vs_buy(INPUTS, precios, sizes=(60, 90))
+    for uri, venta, alquiler in [('a', 2000, 10), ('b', 6000, 20)]:
+        for size in (60, 90):
+            compra = build(precio_vivienda=venta*size/1000, alquiler_mensual=alquiler*size).result()['patrimonio_real']
+            renta = build(precio_vivienda=venta*size/1000, alquiler_mensual=alquiler*size,
+                          year_compra_vivienda=SIN_COMPRA).result()['patrimonio_real']
+            assert np.isclose(result.loc[uri, f'diferencia_{size}m2'], compra[-1] - renta[-1], rtol=1e-9)
+
+
+def test_load_precios():
+    precios = load_precios()
+    assert precios.index.is_unique
+    assert precios[['precio_venta_eur_m2', 'precio_alquiler_eur_m2_mes']].notna().all().all()
+    assert precios['precios_estimados'].any() and not precios['precios_estimados'].all()
@@ -0,0 +1,253 @@
+import dataclasses
+import gc
+import weakref
+import numpy as np
+import pytest
+from models.model import AmortizationRow, CumulativeGrowthRow, EvaluationPlan, FormulaRow, Granularity, LinearRecurrenceRow, Model, Series, SimpleRow
+from models.vida import InputsModeloVida, ModeloVida
+
+INPUTS = InputsModeloVida(
+    year_indepen=2028,
+    year_compra_vivienda=2032,
+    alquiler_mensual=1900,
+    precio_vivienda=600,
+    tin_hipoteca=2.9/100,
+    years_hipoteca=30,
+    ingresos_trabajo_brutos_y0=45,
+    ingresos_trabajo_brutos_y15=100,
+    tasa_impositiva_salario=0.31,
+    nacimiento_hijos=[2030, 2031, 2033, 2035, 2037],
+    coste_educacion_mensual=700,
+    alimentacion_mensual=160,
+    ocio_mensual=50,
+    vestimenta_mensual=50,
+    otros_gastos_mensuales=200,
+    capital_inicial=750,
+)
+
+# ModeloVida before the evaluation plan, for INPUTS, in 2026, 2036, 2056 and 2085
+BASELINE = {
+    'inflaccion_acumulada': [0.03, 0.3842338707244459, 1.5000803453253524, 4.891603104045746],
+    'hipoteca_bop': [0.0, 437.16609370448197, 131.38899045572956, 0.0],
+    'resultado_neto': [27.0375, -29.586106852744265, 8.377293677924428, -142.81245924206888],
+    'fondos_real': [815.0849514563107, 1200.4051896960107, 3132.8470806331857, 15897.155255642707],
+    'patrimonio_real': [819.9393203883495, 1396.7289063084745, 3953.105770721641, 17680.193659456563],
+}
+
+VARIANTS = [
+    {'year_jubilacion': 2050},
+    {'year_compra_vivienda': 2040},
+    {'inflaccion': 0.05},
+    {'capital_inicial': 300, 'tir_ahorros': 0.05},
+    {'descuentos_educacion': False},
+]
+
+
+def build(granularity:str = Granularity.year, **fields) -> ModeloVida:
+    model = ModeloVida(dataclasses.replace(INPUTS, **fields), granularity=granularity)
+    model.build()
+    return model
+
+
+def test_baseline():
+    result = build().result()
+    for row, values in BASELINE.items():
+        assert np.allclose(result[row][[0, 10, 30, 59]], values, rtol=1e-9, atol=1e-9), row
+
+
+@pytest.mark.parametrize('granularity', [Granularity.year, Granularity.month])
+def test_plan_matches_lazy(granularity):
+    assert np.allclose(build(granularity).result().values, build(granularity).result(lazy=True).values, rtol=1e-9, atol=1e-9)
+
+
+def test_lazy_row_read():
+    # Reading a row of a model that was never evaluated goes through the lazy path
+    assert np.isclose(build().patrimonio_real(59), BASELINE['patrimonio_real'][-1], rtol=1e-9)
+
+
+def test_batch_matches_single():
+    batch = ModeloVida.batch([dataclasses.replace(INPUTS, **fields) for fields in VARIANTS]).result()
+    for i, fields in enumerate(VARIANTS):
+        assert np.allclose(batch.values[..., i], build(**fields).result().values, rtol=1e-9, atol=1e-9), fields
+
+
+@pytest.mark.parametrize('fields', VARIANTS)
+def test_set_input_matches_rebuild(fields):
+    model = build()
+    model.evaluate()
+    for field, value in fields.items():
+        model.set_input(field, value)
+    assert np.allclose(model.result().values, build(**fields).result().values, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize('fields', VARIANTS)
+def test_fork_matches_rebuild(fields):
+    model = build()
+    model.evaluate()
+    before = model.result().values.copy()
+    assert np.allclose(model.fork(**fields).result().values, build(**fields).result().values, rtol=1e-9, atol=1e-9)
+    assert np.array_equal(model.result().values, before)
+
+
+def test_check():
+    assert build().check()
+    assert not build(ingresos_trabajo_brutos_y15=20, capital_inicial=20).check()
+    with pytest.raises(ValueError):
+        bool(ModeloVida.batch([INPUTS, INPUTS]).check())
+
+
+def test_batch_with_shared_list_input():
+    # List inputs left unstacked are shared by every scenario; with as many scenarios as vectorized
+    # periods a per-period result of their rows must not be taken as one value per scenario
+    scenarios = build().periods - EvaluationPlan.trace_periods
+    capital = 300 + 10*np.arange(scenarios)
+    model = ModeloVida(dataclasses.replace(INPUTS, capital_inicial=capital))
+    model.scenarios = scenarios
+    model.build()
+    batch = model.result()
+    for i in [0, scenarios - 1]:
+        assert np.allclose(batch.values[..., i], build(capital_inicial=capital[i]).result().values, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize('evaluated', [False, True])
+def test_set_input_then_read(evaluated):
+    # Rows read right after set_input, without evaluating the model first
+    model = build()
+    if evaluated:
+        model.evaluate()
+    else:
+        model.patrimonio_real(59)
+    model.set_input('year_jubilacion', 2050)
+    assert np.isclose(model.patrimonio_real(59), build(year_jubilacion=2050).patrimonio_real(59), rtol=1e-9)
+
+
+def test_set_input_keeps_given_inputs():
+    inputs = dataclasses.replace(INPUTS)
+    model = ModeloVida(inputs)
+    model.build()
+    model.set_input('capital_inicial', 300)
+    assert inputs.capital_inicial == INPUTS.capital_inicial
+    assert np.isclose(model.patrimonio_real(59), build(capital_inicial=300).patrimonio_real(59), rtol=1e-9)
+
+
+def test_goal_seek():
+    model = build()
+    t = 52
+    target = model.patrimonio_real(t)*0.9
+    # Retiring later only adds wealth: the earliest year leaving the target
+    found = model.goal_seek('year_jubilacion', 'patrimonio_real', t, lambda value: value > target, bounds=(2027, 2077))
+    assert found.converged and build(year_jubilacion=found.value).patrimonio_real(t) > target
+    assert build(year_jubilacion=found.value - 1).patrimonio_real(t) <= target
+    assert model.inputs.year_jubilacion == INPUTS.year_jubilacion
+    assert np.isclose(model.patrimonio_real(t), target/0.9, rtol=1e-9)
+    for method in ['secant', 'newton']:
+        found = model.goal_seek('capital_inicial', 'patrimonio_real', t, target, bounds=(0, 2000), method=method)
+        assert found.converged, method
+        assert np.isclose(build(capital_inicial=found.value).patrimonio_real(t), target, atol=1e-5), method
+        assert model.inputs.capital_inicial == INPUTS.capital_inicial
+
+
+def recurrences(rates:list[float]) -> Model:
+    model = Model()
+    model.periods = len(rates)
+    model.rate = SimpleRow(Series(rates))
+    model.flows = SimpleRow(10)
+    model.growth = CumulativeGrowthRow(model.rate)
+    model.balance = LinearRecurrenceRow(model.rate, model.flows, opening=100)
+    model.loan = AmortizationRow(1000, 0.01, 4, 2)
+    return model
+
+
+@pytest.mark.parametrize('rates', [[0.05, 0.1, -0.02, 0.0, 0.03, 0.07], [0.05, -1.0, 0.1, 0.0, 0.02, 0.01]])
+def test_recurrence_rows(rates):
+    growth, balance = [], []
+    for rate in rates:
+        growth.append((1 + rate)*(1 + growth[-1]) - 1 if growth else rate)
+        balance.append((balance[-1] if balance else 100)*(1 + rate) + 10)
+    result = recurrences(rates).result()
+    assert np.allclose(result['growth'], growth) and np.allclose(result['balance'], balance)
+    assert np.allclose(result.values, recurrences(rates).result(lazy=True).values)
+    # Drawn at period 2 and repaid in 4 installments
+    installment = 1000*0.01/(1 - 1.01**-4)
+    assert np.allclose(result['loan'], [0, 0, 1000, 1010 - installment, (1010 - installment)*1.01 - installment,
+                                        ((1010 - installment)*1.01 - installment)*1.01 - installment])
+
+
+def test_model_result():
+    result = build().result()
+    assert result.values.dtype == np.float64 and result.values.flags.c_contiguous
+    assert result.scenarios is None and len(result) == len(build().get_rows())
+    assert np.shares_memory(result['patrimonio_real'], result.values)
+    vivienda = result.group('Vivienda')
+    assert 'hipoteca_bop' in vivienda and np.shares_memory(vivienda.values, result.values)
+    frame = result.to_pandas()
+    assert np.shares_memory(frame.to_numpy(), result.values)
+    assert frame.loc[('Vivienda', 'hipoteca_bop'), 2036] == result['hipoteca_bop'][10]
+
+    batch = ModeloVida.batch([dataclasses.replace(INPUTS, **fields) for fields in VARIANTS[:2]]).result()
+    assert batch.scenarios == 2
+    assert np.array_equal(batch.to_pandas().loc[:, (2036, 1)].to_numpy(), batch.values[:, 10, 1])
+
+
+def test_expression_rows():
+    folded = (SimpleRow(2) + 3)*SimpleRow(4)
+    assert type(folded) is SimpleRow and folded(7) == 20
+    model = Model()
+    model.periods = 4
+    model.a = FormulaRow(lambda row, t: t + 1.0)
+    model.b = (1 + model.a)*2
+    model.c = (model.a + 1)/2
+    model.d = model.b - model.c
+    result = model.result()
+    assert np.allclose(result['d'], [2*(t + 2) - (t + 2)/2 for t in range(4)])
+    # a + 1 and 1 + a share one slot
+    assert len(model.plan.aliases) == 1
+
+
+def test_dispose():
+    model = build()
+    model.evaluate()
+    reference = weakref.ref(model)
+    gc.disable()
+    try:
+        model.dispose()
+        del model
+        # No reference cycle left for the garbage collector
+        assert reference() is None
+    finally:
+        gc.enable()
+
+
+def test_to_html(tmp_path):
+    model = build()
+    html = model.to_html()
+    body = html[html.index('<tbody'):]
+    assert body.count('<tr') == len(model.get_rows()) and body.count('<td') == len(model.get_rows())*model.periods
+    assert '<th class="level1 a">Inflaccion</th><td class="a p">3.0%</td>' in html
+    model.to_html(str(tmp_path / 'vida.html'))
+    assert (tmp_path / 'vida.html').read_text() == html
+    batch = ModeloVida.batch([INPUTS, dataclasses.replace(INPUTS, inflaccion=0.05)]).to_html(titles=['base', 'inflacion'])
+    assert batch.count('<table') == 2 and '5.0%' in batch
+
+
+def test_demand():
+    model = build()
+    plan = model.evaluate(['inflaccion_acumulada'], 10)
+    assert plan.filled[plan.slots['inflaccion_acumulada']] >= 11
+    # Rows the output does not depend on are left after the traced periods
+    assert plan.filled[plan.slots['patrimonio_real']] < model.periods
+    # and evaluated on demand when read
+    assert np.isclose(model.patrimonio_real(59), BASELINE['patrimonio_real'][-1], rtol=1e-9)
+    assert np.allclose(model.result().values, build().result().values, rtol=1e-9, atol=1e-9)
+
+
+def test_sensitivities():
+    model = build()
+    sensitivities = model.sensitivities(['patrimonio_real', 'fondos_real'])
+    assert 'year_jubilacion' not in sensitivities.derivatives
+    assert np.allclose(sensitivities.values['patrimonio_real'], build().result()['patrimonio_real'], rtol=1e-9)
+    for field in ['capital_inicial', 'inflaccion']:
+        step = 1e-4*max(abs(getattr(INPUTS, field)), 1)
+        up = build(**{field: getattr(INPUTS, field) + step}).result()['patrimonio_real']
+        down = build(**{field: getattr(INPUTS, field) - step}).result()['patrimonio_real']
+        assert np.allclose(sensitivities.derivatives[field]['patrimonio_real'], (up - down)/(2*step), rtol=1e-4, atol=1e-6), field
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from models.model import EvaluationPlan, Granularity
+from models.montecarlo import Bootstrap, LogNormal, Normal, QuantileSketch, monte_carlo
+from models.vida import ModeloVida
+from test_model import INPUTS, build
+
+
+@pytest.mark.parametrize('granularity', [Granularity.year, Granularity.month])
+def test_zero_variance_matches_deterministic(granularity):
+    # As many paths as vectorized periods, where a shared list input once broadcast along the paths
+    paths = build(granularity).periods - EvaluationPlan.trace_periods if granularity == Granularity.year else 20
+    result = monte_carlo(ModeloVida, INPUTS, {'inflaccion': Normal(INPUTS.inflaccion, 0)}, paths=paths, workers=1,
+                         rows=('patrimonio_real', 'hijos'), granularity=granularity)
+    expected = build(granularity).result()
+    assert result.paths == paths
+    assert len(result.periods) == len(expected.periods)
+    for row in ['patrimonio_real', 'hijos']:
+        assert np.allclose(result.mean[row], expected[row], rtol=1e-9, atol=1e-9), row
+        assert np.allclose(result.percentiles[row][50], expected[row], rtol=1e-9, atol=1e-9), row
+
+
+def test_workers_do_not_change_results():
+    stochastic = {'inflaccion': Normal(0.03, 0.01)}
+    whole = monte_carlo(ModeloVida, INPUTS, stochastic, paths=200, chunk_size=100, seed=1, workers=1)
+    assert np.all(np.diff(np.array([whole.percentiles['patrimonio_real'][p] for p in (5, 50, 95)]), axis=0) >= 0)
+    again = monte_carlo(ModeloVida, INPUTS, stochastic, paths=200, chunk_size=100, seed=1, workers=2)
+    assert np.array_equal(whole.mean['patrimonio_real'], again.mean['patrimonio_real'])
+
+
+def test_distributions():
+    rng = np.random.default_rng(0)
+    rates = LogNormal(0.05, 0.1).sample(rng, 200_000)
+    assert np.isclose(rates.mean(), 0.05, atol=1e-3) and np.isclose(rates.std(), 0.1, atol=1e-3)
+    series = np.arange(10.0)
+    draws = Bootstrap(series, block=3).sample(rng, (7, 4))
+    assert draws.shape == (7, 4)
+    # Blocks are runs of consecutive values
+    assert (np.diff(draws[:3], axis=0) == 1).all()
+
+
+def test_quantile_sketch():
+    rng = np.random.default_rng(1)
+    paths = rng.normal(size=(20_000, 3))
+    sketch = QuantileSketch.from_paths(paths[:5_000], size=200)
+    for start in range(5_000, 20_000, 5_000):
+        sketch = sketch.merge(QuantileSketch.from_paths(paths[start:start + 5_000], size=200))
+    for q in (0.05, 0.5, 0.95):
+        assert np.allclose(sketch.quantile(q), np.quantile(paths, q, axis=0), atol=0.02), q
+
+
+def test_ever_false():
+    # A 60% yearly inflation leaves no funds available in some period on every path
+    result = monte_carlo(ModeloVida, INPUTS, {'inflaccion': Normal(0.6, 0)}, paths=10, workers=1)
+    assert result.probability_ever_false['fondos_disponibles'] == 1
+    assert monte_carlo(ModeloVida, INPUTS, {'inflaccion': Normal(0.03, 0)}, paths=10, workers=1).probability_ever_false['fondos_disponibles'] == 0
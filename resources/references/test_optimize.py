@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from models.model import Granularity
+from models.optimize import pareto_front, pareto_search
+from models.vida import ModeloVida
+from test_model import INPUTS, build
+
+
+def test_pareto_front():
+    objectives = np.array([[1, 3], [2, 2], [1, 1], [3, 0], [2, 2]])
+    assert pareto_front(objectives).tolist() == [True, True, False, True, True]
+
+
+@pytest.mark.parametrize('granularity', [Granularity.year, Granularity.month])
+def test_pareto_search(granularity):
+    result = pareto_search(ModeloVida, INPUTS, {'year_jubilacion': (2040, 2070)},
+                           {'year_jubilacion': 'min', 'patrimonio_real': 'max'},
+                           condition=lambda model: model.patrimonio_real(model.periods - 1) > 0,
+                           levels=4, max_level=2, granularity=granularity)
+    frame = result.df()
+    for point in frame.itertuples():
+        model = build(granularity, year_jubilacion=point.year_jubilacion)
+        expected = model.result()['patrimonio_real'][-1]
+        assert np.isclose(point.patrimonio_real, expected, rtol=1e-9)
+        assert point.feasible == (expected > 0 and bool(model.check()))
+    frontier = result.frontier()
+    assert frontier.feasible.all()
+    # Along one decision the frontier is the feasible point with the best value for every retirement year
+    assert (np.diff(frontier.patrimonio_real.to_numpy()) > 0).all()
+
+
+def test_budget_and_integers():
+    result = pareto_search(ModeloVida, INPUTS, {'year_compra_vivienda': (2027, 2047), 'precio_vivienda': (300.0, 900.0)},
+                           {'precio_vivienda': 'max', 'patrimonio_real': 'max'}, levels=5, budget=60)
+    assert 25 < result.evaluations <= 60
+    assert np.array_equal(result.points['year_compra_vivienda'], np.round(result.points['year_compra_vivienda']))
+    assert len(set(zip(result.points['year_compra_vivienda'], result.points['precio_vivienda']))) == result.evaluations
+    front = result.df()[result.pareto]
+    objectives = front[['precio_vivienda', 'patrimonio_real']].to_numpy()
+    assert pareto_front(objectives).all()
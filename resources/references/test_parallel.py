@@ -0,0 +1,37 @@
+import dataclasses
+import numpy as np
+import pytest
+from models.model import Granularity
+from models.parallel import run_parallel
+from models.spec import SpecModel
+from models.vida import ModeloVida
+from test_model import INPUTS, build
+from test_spec import SPEC, Ahorro
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_model_class(workers):
+    inputs = [dataclasses.replace(INPUTS, capital_inicial=capital) for capital in (300, 750, 1200)]
+    with run_parallel(ModeloVida, inputs, ['patrimonio_real', 'hijos'], chunk_size=2, workers=workers) as result:
+        assert result.periods == build().period_labels()
+        for i, capital in enumerate((300, 750, 1200)):
+            expected = build(capital_inicial=capital).result()
+            for row in result.rows:
+                assert np.allclose(result.arrays[row][i], expected[row], rtol=1e-9), row
+
+
+def test_spec():
+    inputs = [Ahorro(capital=100, aportacion=aportacion, tir=0.03) for aportacion in range(5)]
+    with run_parallel(SPEC, inputs, chunk_size=2, workers=2) as result:
+        for i, item in enumerate(inputs):
+            model = SpecModel(SPEC, item)
+            model.build()
+            assert np.allclose(result.arrays['saldo'][i], model.result()['saldo'])
+
+
+def test_monthly():
+    inputs = [dataclasses.replace(INPUTS, capital_inicial=capital) for capital in (300, 1200)]
+    with run_parallel(ModeloVida, inputs, ['patrimonio_real'], chunk_size=1, workers=2, granularity=Granularity.month) as result:
+        assert len(result.periods) == 720
+        for i, capital in enumerate((300, 1200)):
+            assert np.allclose(result.arrays['patrimonio_real'][i], build(Granularity.month, capital_inicial=capital).result()['patrimonio_real'], rtol=1e-9)
@@ -0,0 +1,28 @@
+import json
+import numpy as np
+from test_model import build
+
+
+def test_profile():
+    model = build()
+    before = model.result().values.copy()
+    classes = [type(row) for row in model.plan.rows]
+    profile = model.profile()
+    rows = profile.rows()
+    assert {'patrimonio_real', 'fondos_eop', 'hipoteca_bop'} <= set(rows)
+    assert all(stats.evaluations > 0 for stats in rows.values())
+    # Instrumentation is only attached while profiling
+    assert [type(row) for row in model.plan.rows] == classes
+    model.set_input('capital_inicial', 300)
+    assert np.allclose(model.result().values, build(capital_inicial=300).result().values, rtol=1e-9)
+    assert not np.allclose(model.result().values, before)
+
+
+def test_graph():
+    profile = build().profile()
+    graph = json.loads(profile.to_json())
+    assert len(graph['nodes']) == len(profile.slots)
+    slots = {name: slot for slot, name in enumerate(profile.names)}
+    # Savings carry over from the previous period
+    assert {'source': slots['fondos_eop'], 'target': slots['fondos_bop'], 'lag': 1} in graph['edges']
+    assert f"n{slots['fondos_eop']} -> n{slots['fondos_bop']} [style=dashed];" in profile.to_dot()
@@ -0,0 +1,56 @@
+import asyncio
+import dataclasses
+import json
+import numpy as np
+import pytest
+from models.service import VidaService, normalize
+from test_model import INPUTS, build
+
+
+def post(service:VidaService, payloads:list) -> list[tuple[str, dict]]:
+    async def run():
+        service.queue = asyncio.Queue()
+        batcher = asyncio.create_task(service.batcher())
+        try:
+            return await asyncio.gather(*(service.route('POST', '/evaluate', json.dumps(payload).encode()) for payload in payloads))
+        finally:
+            batcher.cancel()
+    return [(status, json.loads(body)) for status, body in asyncio.run(run())]
+
+
+@pytest.fixture(scope='module')
+def service():
+    service = VidaService(workers=1)
+    yield service
+    service.executor.shutdown()
+
+
+def test_evaluate(service):
+    payload = {**dataclasses.asdict(INPUTS), 'campo_del_frontend': 1}
+    (status, response), = post(service, [payload])
+    assert status == "200 OK"
+    assert response['ignored'] == ['campo_del_frontend']
+    rows = {row['name']: row['values'] for row in response['rows']}
+    assert np.allclose(rows['patrimonio_real'], build().result()['patrimonio_real'], rtol=1e-9)
+
+
+def test_bad_request_does_not_fail_its_batch(service):
+    good = dataclasses.asdict(INPUTS)
+    statuses = [status for status, _ in post(service, [good, {**good, 'inflaccion': 'mucha'}, {**good, 'capital_inicial': -1}])]
+    assert statuses == ["200 OK", "400 Bad Request", "200 OK"]
+
+
+def test_not_finite():
+    with pytest.raises(ValueError):
+        normalize({**dataclasses.asdict(INPUTS), 'inflaccion': float('nan')})
+    with pytest.raises(ValueError):
+        normalize({**dataclasses.asdict(INPUTS), 'tin_hipoteca': 'inf'})
+    service = VidaService.__new__(VidaService)
+    service.periods, service.rows = [2026, 2027], [{'name': 'a'}, {'name': 'b'}]
+    body = json.loads(service.encode(np.array([[1.0, np.nan], [np.inf, 2.0]])))
+    assert [row['values'] for row in body['rows']] == [[1.0, None], [None, 2.0]]
+
+
+def test_zero_rate_mortgage():
+    assert np.isfinite(build(tin_hipoteca=0).result().values).all()
+    assert np.isfinite(build(years_hipoteca=0).result().values).all()
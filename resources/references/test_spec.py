@@ -0,0 +1,58 @@
+import json
+import pickle
+import numpy as np
+import pytest
+from dataclasses import dataclass
+from models.model import Granularity
+from models.spec import ModelSpec, SpecModel
+
+
+@dataclass
+class Ahorro:
+    capital: float
+    aportacion: float
+    tir: float
+
+
+SPEC = ModelSpec(periods=10)
+SPEC.row('aportacion', input='aportacion')
+SPEC.row('saldo', "inputs.capital*(1 + inputs.tir)**(t + 1) + aportacion(t)*(t + 1)")
+
+
+def saldo(capital, aportacion, tir, t):
+    return capital*(1 + tir)**(t + 1) + aportacion*(t + 1)
+
+
+@pytest.fixture
+def model():
+    model = SpecModel(SPEC, Ahorro(capital=100, aportacion=10, tir=0.03))
+    model.build()
+    return model
+
+
+def test_sensitivities(model):
+    sensitivities = model.sensitivities(['saldo'])
+    t = np.arange(10)
+    assert np.allclose(sensitivities.values['saldo'], saldo(100, 10, 0.03, t))
+    assert np.allclose(sensitivities.derivatives['tir']['saldo'], 100*(t + 1)*1.03**t, rtol=1e-6)
+    assert np.allclose(sensitivities.derivatives['aportacion']['saldo'], t + 1, rtol=1e-6)
+
+
+def test_goal_seek_newton(model):
+    result = model.goal_seek('tir', 'saldo', 9, 250, (0, 0.2), method='newton')
+    assert result.converged
+    assert np.isclose(saldo(100, 10, result.value, 9), 250, atol=1e-5)
+
+
+def test_pickle(model):
+    model.evaluate()
+    copy = pickle.loads(pickle.dumps(model))
+    assert np.array_equal(copy.result().values, model.result().values)
+    assert ModelSpec.from_dict(json.loads(json.dumps(SPEC.to_dict()))) == SPEC
+
+
+def test_pickle_monthly():
+    model = SpecModel(SPEC, Ahorro(capital=100, aportacion=10, tir=0.03), granularity=Granularity.month)
+    copy = pickle.loads(pickle.dumps(model))
+    assert copy.granularity == Granularity.month
+    assert copy.period_labels() == model.period_labels()
@@ -0,0 +1,45 @@
+import dataclasses
+import numpy as np
+import pytest
+from models.sweep import load_sweep, sweep
+from models.vida import ModeloVida
+from test_model import INPUTS, build
+
+GRID = {'year_jubilacion': [2050, 2060], 'capital_inicial': [300, 750, 1200]}
+
+
+def test_sweep_matches_single(tmp_path):
+    paths = sweep(ModeloVida, INPUTS, GRID, str(tmp_path), periods=[2036, 2085], chunk_size=4)
+    assert len(paths) == 2
+    frame = load_sweep(str(tmp_path))
+    assert len(frame) == 6
+    for point in frame.itertuples():
+        expected = build(year_jubilacion=point.year_jubilacion, capital_inicial=point.capital_inicial).result()['patrimonio_real']
+        assert np.allclose([point.patrimonio_real_2036, point.patrimonio_real_2085], expected[[10, 59]], rtol=1e-9)
+
+
+def versioned(version):
+    class Modelo(ModeloVida):
+        pass
+    Modelo.version = version
+    return Modelo
+
+
+def test_resume(tmp_path):
+    directory = str(tmp_path)
+    first = sweep(versioned(1), INPUTS, GRID, directory, chunk_size=4)
+    written = [path.stat().st_mtime_ns for path in sorted(tmp_path.glob('chunk-*'))]
+    assert sweep(versioned(1), INPUTS, GRID, directory, chunk_size=4) == first
+    assert [path.stat().st_mtime_ns for path in sorted(tmp_path.glob('chunk-*'))] == written
+    with pytest.raises(ValueError, match='inputs'):
+        sweep(versioned(1), dataclasses.replace(INPUTS, inflaccion=0.05), GRID, directory, chunk_size=4)
+    with pytest.raises(ValueError, match='version'):
+        sweep(versioned(2), INPUTS, GRID, directory, chunk_size=4)
+
+
+def test_sweep_monthly(tmp_path):
+    sweep(ModeloVida, INPUTS, {'capital_inicial': [300, 1200]}, str(tmp_path), periods=['2085-12'], granularity='month')
+    frame = load_sweep(str(tmp_path))
+    for point in frame.itertuples():
+        expected = build('month', capital_inicial=point.capital_inicial).result()['patrimonio_real'][-1]
+        assert np.isclose(frame.loc[point.Index, 'patrimonio_real_2085-12'], expected, rtol=1e-9)
@@ -0,0 +1,225 @@
+import numpy as np
+from dataclasses import dataclass
+from models.model import Model, FormulaRow, SimpleRow, InputRow, CumulativeGrowthRow, LinearRecurrenceRow, AmortizationRow, Formats, where, maximum, minimum
+
+@dataclass
+class InputsModeloVida:
+    nacimiento_hijos: list[int]
+    coste_educacion_mensual: int
+    alimentacion_mensual: int
+    ocio_mensual: int
+    vestimenta_mensual: int
+    otros_gastos_mensuales: int
+
+    alquiler_mensual: int
+    precio_vivienda: int
+    tin_hipoteca: float
+    years_hipoteca: int
+
+    year_indepen: int
+    year_compra_vivienda: int
+    ingresos_trabajo_brutos_y0: int     #Ingresos totales brutos del hogar en el primer año (salarios brutos del hogar)
+    ingresos_trabajo_brutos_y15: int    #Ingresos totales brutos estimado del hogar en el año 15 (salarios brutos del hogar nominales)
+
+    porcentaje_gastos_fijos_vivienda: float = 2/100
+    porcentaje_entrada_vivienda: float = 20/100
+    inflaccion: float = 3/100
+    tir_inmobiliaria: float = 2/100
+    capital_inicial: int = 20
+    tir_ahorros: float = 9/100
+    tasa_impositiva_salario: float = 30/100
+    year_jubilacion: int = 2065
+    gastos_jubilado: int = 70
+    ayuda_entrada: float = 0
+    liquido_minimo: float = 5
+
+    descuentos_educacion: bool = True
+
+
+class ModeloVida(Model):
+    inputs_type = InputsModeloVida
+    discrete_inputs = ('year_indepen', 'year_compra_vivienda', 'years_hipoteca', 'year_jubilacion')
+
+    def __init__(self, inputs:InputsModeloVida, **kwargs):
+        super().__init__(**kwargs)
+        self.inputs = inputs
+        # 60 years, in months with granularity=Granularity.month
+        self.periods = 60*self.periods_per_year
+        self.initial_period = 2026
+
+    def build(self):
+        # Formulas are written with where/maximum/minimum so the same model evaluates a single
+        # InputsModeloVida or a batch of them (see Model.batch). Inputs are only read inside
+        # formulas, never at build time, so Model.set_input can change them without a rebuild.
+        # Amounts are per period (self.per_period), rates compound per period (self.rate) and
+        # one-off payments fall in the first period of their year (self.year_start).
+        inputs = self.inputs
+
+        # Macro
+        self.set_group("Macro")
+
+        self.inflaccion = InputRow(inputs, 'inflaccion', format=Formats.percentage)
+        self.inflaccion_acumulada = CumulativeGrowthRow(FormulaRow(lambda row,t: self.rate(self.inflaccion(t))), format=Formats.percentage)
+
+        # Vivienda
+
+        self.set_group("Vivienda")
+
+        self.hipoteca_tin = InputRow(inputs, 'tin_hipoteca', format=Formats.percentage)
+
+        def entrada_vivienda():
+            return inputs.precio_vivienda*inputs.porcentaje_entrada_vivienda
+
+        def prestamo_hipoteca():
+            return inputs.precio_vivienda - entrada_vivienda()
+
+        def tipo_hipoteca():
+            # The TIN is a nominal annual rate, paid monthly as TIN/12
+            return inputs.tin_hipoteca/self.periods_per_year
+
+        def cuota_hipoteca():
+            # At 0% the loan is repaid in equal parts, and without payments there is no loan
+            tipo, pagos = tipo_hipoteca(), inputs.years_hipoteca*self.periods_per_year
+            plazos = maximum(pagos, 1)
+            factor = where(tipo == 0, 1/plazos, tipo/where(tipo == 0, 1, 1 - (1+tipo)**(-plazos)))
+            return where(pagos > 0, prestamo_hipoteca()*factor, 0)
+
+        self.entrada_hipoteca =  FormulaRow(lambda row,t: where((self.period(t) == inputs.year_compra_vivienda) & self.year_start(t), -entrada_vivienda(), 0))
+
+        self.hipoteca = FormulaRow(lambda row,t: where((inputs.year_compra_vivienda <= self.period(t)) & (self.period(t) < inputs.year_compra_vivienda + inputs.years_hipoteca), 1, 0))
+        self.hipoteca_bop = AmortizationRow(FormulaRow(lambda row,t: prestamo_hipoteca()),
+                                            FormulaRow(lambda row,t: tipo_hipoteca()),
+                                            FormulaRow(lambda row,t: inputs.years_hipoteca*self.periods_per_year),
+                                            FormulaRow(lambda row,t: (inputs.year_compra_vivienda - self.initial_period)*self.periods_per_year))
+        self.hipoteca_interes = FormulaRow(lambda row, t: -self.hipoteca_bop(t)*self.hipoteca_tin(t)/self.periods_per_year)
+        self.hipoteca_cuota = FormulaRow(lambda row,t: -cuota_hipoteca()*self.hipoteca(t))
+        self.hipoteca_pago_deuda = FormulaRow(lambda row,t: self.hipoteca_cuota(t) - self.hipoteca_interes(t))
+        self.hipoteca_eop = FormulaRow(lambda row, t: maximum(0, self.hipoteca_bop(t)+self.hipoteca_pago_deuda(t)))
+        self.patrimonio_inmobiliario = FormulaRow(lambda row,t: where(inputs.year_compra_vivienda <= self.period(t), inputs.precio_vivienda - self.hipoteca_eop(t), 0))
+
+        self.vivienda_tir = InputRow(inputs, 'tir_inmobiliaria', format=Formats.percentage)
+        # Grows from the purchase on, on top of the first year's rate
+        self.vivienda_tir_accumulada = CumulativeGrowthRow(FormulaRow(lambda row,t: self.rate(self.vivienda_tir(t))),
+                                                           FormulaRow(lambda row,t: (t == 0) | (self.period(t) >= inputs.year_compra_vivienda)),
+                                                           format=Formats.percentage)
+        self.patrimonio_inmobiliario_real = self.patrimonio_inmobiliario*(1+self.vivienda_tir_accumulada)
+
+        self.gastos_fijos = FormulaRow(lambda row,t: -self.hipoteca(t)*self.per_period(inputs.precio_vivienda*inputs.porcentaje_gastos_fijos_vivienda))
+        self.gastos_fijos_inf = self.gastos_fijos*(self.inflaccion_acumulada + 1)
+        self.alquiler = FormulaRow(lambda row,t: where((inputs.year_indepen <= self.period(t)) & (self.period(t) < inputs.year_compra_vivienda), -self.per_period(inputs.alquiler_mensual*12/1000), 0))
+        self.alquiler_inf = self.alquiler*(1+self.inflaccion_acumulada)
+
+        self.vivienda_recurrente = self.hipoteca_cuota + self.gastos_fijos_inf + self.alquiler_inf
+
+        self.otros_gastos_compra = FormulaRow(lambda row,t: where((self.period(t) == inputs.year_compra_vivienda) & self.year_start(t), -inputs.precio_vivienda*0.10, 0))
+        self.vivienda_extra =  self.entrada_hipoteca + self.otros_gastos_compra
+
+        self.total_vivienda = self.vivienda_recurrente + self.vivienda_extra
+        self.total_vivienda.highlight = True
+
+        # Familia
+
+        self.set_group("Familia")
+
+        def nacimientos():
+            # Padded with NaN in batches, comparisons against NaN are False so missing children never count
+            return np.asarray(inputs.nacimiento_hijos, dtype=float)
+
+        self.independizado = FormulaRow(lambda row,t: where(self.period(t) >= inputs.year_indepen, 1, 0))
+        self.padres = SimpleRow(2)
+        self.hijos = FormulaRow(lambda row, t: np.sum(nacimientos() < self.period(t), axis=-1))
+
+        def coste_por_hijo():
+            return self.per_period(inputs.coste_educacion_mensual*12/1000)
+
+        self.educacion_por_hijo = FormulaRow(lambda row,t: -coste_por_hijo())
+
+        def func_hijos_colegio(row, t):
+            edades = np.maximum(0, self.period(t) - nacimientos())
+            hijos_colegio = np.sum((1 <= edades) & (edades <= 23), axis=-1)
+            return hijos_colegio
+
+        self.hijos_colegio = FormulaRow(func_hijos_colegio)
+
+        def func_descuento_educacion(row, t):
+            hijos_colegio = self.hijos_colegio(t)
+            coste = coste_por_hijo()
+            descuento = where(hijos_colegio == 2, 0.15*coste,
+                        where(hijos_colegio == 3, 0.15*coste + 0.50*coste,
+                        where(hijos_colegio >= 4, 0.15*coste + 0.50*coste + self.per_period(1.0*(hijos_colegio-3)), 0)))
+
+            return where(inputs.descuentos_educacion, descuento, 0)
+
+
+        self.educacion_descuento = FormulaRow(func_descuento_educacion)
+        self.educacion = self.educacion_por_hijo*self.hijos_colegio + self.educacion_descuento
+
+        self.alimentacion = FormulaRow(lambda row,t: -1*(self.padres(t) + self.hijos(t))*self.per_period(inputs.alimentacion_mensual*12/1000)*self.independizado(t))
+        self.ocio = FormulaRow(lambda row,t: -1*(self.padres(t) + self.hijos(t))*self.per_period(inputs.ocio_mensual*12/1000))
+        self.vestimenta = FormulaRow(lambda row,t: -1*(self.padres(t) + self.hijos(t))*self.per_period(inputs.vestimenta_mensual*12/1000))
+        otros_gastos_hijos = FormulaRow(lambda row,t: -1*self.per_period(inputs.otros_gastos_mensuales*12/1000))
+
+        self.total_familia = self.educacion + self.alimentacion + self.ocio + self.vestimenta + otros_gastos_hijos
+        self.total_familia_inf = self.total_familia * (1 + self.inflaccion_acumulada)
+
+        self.total_familia_inf.highlight = True
+
+        # P&G
+        self.set_group("P&G")
+
+
+
+        def func_ingresos(t):
+            s0, s15 = inputs.ingresos_trabajo_brutos_y0, inputs.ingresos_trabajo_brutos_y15
+            year = t//self.periods_per_year
+            return self.per_period(where(year >= 15, s15, s0 + year*(s15-s0)/15))
+
+        self.ingresos_brutos_nominal = FormulaRow(lambda row, t: func_ingresos(t))
+        self.ingresos_brutos_real = self.ingresos_brutos_nominal*(1+self.inflaccion_acumulada)
+
+        self.jubilado = FormulaRow(lambda row,t: self.period(t) >= inputs.year_jubilacion, format=Formats.boolean)
+        self.ingresos_totales = self.ingresos_brutos_real*(1 - self.jubilado)
+        self.tasa_impositiva = InputRow(inputs, 'tasa_impositiva_salario', format=Formats.percentage)
+        self.ingresos_netos = self.ingresos_totales - self.ingresos_totales*self.tasa_impositiva
+
+        self.gastos_vivienda = self.vivienda_recurrente + self.vivienda_extra
+        self.gastos_totales =  self.total_familia_inf + self.gastos_vivienda
+
+        self.ayuda_entrada = FormulaRow(lambda row,t: where((self.period(t) == inputs.year_compra_vivienda) & self.year_start(t), inputs.ayuda_entrada, 0))
+
+        self.resultado_neto = self.ingresos_netos + self.gastos_totales + self.ayuda_entrada
+        self.resultado_neto.highlight = True
+
+        # Patrimonio
+        self.set_group("Patrimonio")
+
+        self.beneficios_netos = FormulaRow(lambda row,t: maximum(0, self.resultado_neto(t)))
+
+        self.liquido = FormulaRow(lambda row,t: minimum(self.beneficios_netos(t), self.per_period(inputs.liquido_minimo)))
+
+        self.fondos_eop: FormulaRow
+        self.fondos_bop = FormulaRow(lambda row,t: self.fondos_eop(t-1) if t > 0 else inputs.capital_inicial)
+        self.suscripciones = self.beneficios_netos - self.liquido
+
+        self.reembolsos_netos = FormulaRow(lambda row,t: minimum(0, self.resultado_neto(t)))
+        self.impuestos_ganancias = 0.05*self.reembolsos_netos
+
+        self.reembolsos = FormulaRow(lambda row,t: maximum(self.reembolsos_netos(t) + self.impuestos_ganancias(t), -self.fondos_bop(t)))
+
+        self.fondos_disponibles = FormulaRow(lambda row,t:  self.fondos_bop(t) > abs(self.reembolsos(t)), format=Formats.boolean)
+
+        self.crecimiento = InputRow(inputs, 'tir_ahorros', format=Formats.percentage)
+        self.interes = FormulaRow(lambda row,t: self.rate(self.crecimiento(t))*self.fondos_bop(t))
+
+        # Reembolsos are capped by fondos_bop, so the funds are still stepped period by period with it
+        self.fondos_eop = LinearRecurrenceRow(FormulaRow(lambda row,t: self.rate(self.crecimiento(t))),
+                                              self.suscripciones + self.reembolsos, InputRow(inputs, 'capital_inicial'))
+        self.fondos_real = self.fondos_eop/(self.inflaccion_acumulada +  1)
+        self.fondos_real.highlight = True
+
+        self.patrimonio_real = self.fondos_real + self.patrimonio_inmobiliario_real + (self.liquido/(self.inflaccion_acumulada +  1))
+        self.patrimonio_real.highlight = True
+
+        # Reglas
+        self.rule('fondos_disponibles', self.fondos_disponibles)
+        self.rule('hipoteca_pagada', FormulaRow(lambda row,t: self.hipoteca_bop(t) <= 0), when=self.jubilado)